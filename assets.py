@@ -0,0 +1,150 @@
+import glob
+import hashlib
+import heapq
+import os
+import threading
+import time
+
+import pygame as pg
+
+from resources import track_sound
+
+# Background asset loading. The game draws its first frame (a loading screen)
+# straight away while a worker thread loads fonts and decodes sound effects,
+# most urgent first. Decoded sounds are cached on disk as raw PCM in the
+# mixer's output format, so later launches skip the decoder entirely.
+# Music is not loaded here: pg.mixer.music streams it from disk as it plays.
+
+ASSET_CACHE_DIR = "asset_cache"
+PCM_CACHE_VERSION = 1
+
+# Load priorities, lowest first
+URGENT = 0    # needed by the screen being shown
+NORMAL = 10
+
+# ---------- PCM cache ----------
+def pcm_cache_path(path, cache_dir=None):
+    # The key covers the source file and the mixer format, so editing a sound
+    # or changing the mixer settings just misses the cache
+    st = os.stat(path)
+    key = repr((PCM_CACHE_VERSION, os.path.abspath(path), st.st_size, st.st_mtime_ns, pg.mixer.get_init()))
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir or ASSET_CACHE_DIR, f"{stem}.{digest}.pcm")
+
+def load_sound(path, cache_dir=None):
+    # Returns (pg.mixer.Sound, True if it came from the cache)
+    cache_path = pcm_cache_path(path, cache_dir)
+    try:
+        with open(cache_path, "rb") as f:
+            return track_sound(pg.mixer.Sound(buffer=f.read()), path), True
+    except OSError:
+        pass
+    sound = track_sound(pg.mixer.Sound(path), path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        stem = cache_path[:-len(".pcm")].rsplit(".", 1)[0]
+        for stale in glob.glob(glob.escape(stem) + ".*.pcm"):
+            os.remove(stale)  # older decodes of the same file
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(sound.get_raw())
+        os.replace(tmp_path, cache_path)  # a killed write never leaves a short file behind
+    except OSError as e:
+        print("Failed to cache sound:", e)
+    return sound, False
+
+# ---------- Loader ----------
+class AssetLoader(threading.Thread):
+    # Loads named assets off the game thread. Jobs run in priority order and
+    # prioritize() moves the ones the game needs now to the front. Results go
+    # into `loaded` (or `failed`), which only the loader thread writes, so the
+    # game thread just looks names up.
+    def __init__(self, cache_dir=None):
+        super().__init__(name="asset-loader", daemon=True)
+        self.cache_dir = cache_dir or ASSET_CACHE_DIR
+        self.loaded = {}
+        self.failed = {}
+        self.total = 0
+        self.cache_hits = 0
+        self.load_time = 0.0     # seconds spent loading on the worker
+        self.finished_at = None  # perf_counter() when the last asset finished
+        self._jobs = {}          # name -> function returning the asset, until it starts
+        self._queue = []         # heap of (priority, seq, name); bumped names leave stale entries
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+
+    def add(self, name, load, priority=NORMAL):
+        with self._cond:
+            self._jobs[name] = load
+            self.total += 1
+            self._push(name, priority)
+            self._cond.notify()
+
+    def add_sound(self, name, path, priority=NORMAL):
+        def load():
+            sound, cached = load_sound(path, self.cache_dir)
+            self.cache_hits += cached
+            return sound
+        self.add(name, load, priority)
+
+    def add_font(self, name, path, size, priority=NORMAL):
+        self.add(name, lambda: pg.font.Font(path, size), priority)
+
+    def _push(self, name, priority):
+        heapq.heappush(self._queue, (priority, self._seq, name))
+        self._seq += 1
+
+    def prioritize(self, names, priority=URGENT):
+        with self._cond:
+            for name in names:
+                if name in self._jobs:
+                    self._push(name, priority)
+
+    def ready(self, names):
+        # True once every one of names has loaded or failed
+        return all(name in self.loaded or name in self.failed for name in names)
+
+    @property
+    def done(self):
+        return len(self.loaded) + len(self.failed) == self.total
+
+    def progress(self):
+        # Fraction of the added assets that are finished
+        return (len(self.loaded) + len(self.failed)) / self.total if self.total else 1.0
+
+    def close(self, timeout=5.0):
+        # Stops after the asset being loaded; the rest are dropped
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, name = heapq.heappop(self._queue)
+                load = self._jobs.pop(name, None)
+            if load is None:
+                continue  # already taken through a higher-priority entry
+            start = time.perf_counter()
+            try:
+                asset = load()
+            except Exception as e:
+                asset, error = None, e
+                print(f"Failed to load {name}:", e)
+            else:
+                error = None
+            now = time.perf_counter()
+            self.load_time += now - start
+            self.finished_at = now  # set before the result is published, so done implies it
+            if error is None:
+                self.loaded[name] = asset
+            else:
+                self.failed[name] = error
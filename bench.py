@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation import (GameSim, DIFFICULTIES, DIFFICULTY_PARAMS, GROUND_Y, OBSTACLE_SIZE, OBSTACLE_SPAWN_Z,
+                        OBSTACLE_END_Z, ROAD_WIDTH, corridor_policy)
+from leaderboard import LeaderboardStore, LeaderboardView
+
+# Rendering benchmark. Draws scripted scenes through the game's own render path
+# (sun, track, obstacle cars, player car, HUD / menus) and reports frames per
+# second, GL calls per frame and Python allocations per frame for each one.
+# Results are compared against a stored baseline and the run fails if any scene
+# got slower than the threshold, makes more GL calls, or allocates more.
+#
+#   python bench.py --headless                  # Mesa llvmpipe, no window needed
+#   python bench.py --headless --save-baseline
+#   python bench.py --headless --immediate --scenes obstacles_100
+#   python bench.py --headless --quality low    # one tier of project.QUALITY_TIERS
+#   python bench.py --headless --soak 10        # 10 minute resource leak check
+
+BASELINE_PATH = "bench_baseline.json"
+WARMUP_FRAMES = 30
+BENCH_FRAMES = 300
+BENCH_ROUNDS = 5         # fps comes from the best round, which is far less noisy than the mean
+COUNT_FRAMES = 10        # frames drawn with GL call counting on
+ALLOC_FRAMES = 30        # frames drawn with tracemalloc on
+REGRESSION_THRESHOLD = 0.15
+ALLOC_SLACK_KB = 1.0     # allocation noise ignored when comparing against the baseline
+SEED = 1234
+TRACK_STEP = 0.3         # road scroll per frame, so the track is never static
+
+# scene -> (game state, obstacles on the road)
+SCENES = {
+    "menu": ("menu", 0),
+    "leaderboard": ("leaderboard", 0),
+    "empty": ("playing", 0),
+    "obstacles_10": ("playing", 10),
+    "obstacles_100": ("playing", 100),
+    "obstacles_1000": ("playing", 1000),
+}
+LEADERBOARD_ROWS = 10
+
+# Soak run: every state at every quality tier while a Rush Hour game plays
+# itself, over and over. GL objects and sounds alive (see resources.py) are
+# counted after the first round and must not grow after that.
+SOAK_STATES = ["menu", "difficulty", "leaderboard", "playing", "game_over"]
+SOAK_FRAMES = 60            # frames per state and tier in each round
+SOAK_SAMPLE_INTERVAL = 30.0 # seconds between printed resource counts
+
+def use_headless_gl():
+    # Offscreen SDL window with an EGL context on Mesa's software rasterizer.
+    # Has to run before pygame and PyOpenGL are imported.
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+
+# ---------- Scenes ----------
+def make_sim(count, seed=SEED):
+    # A Normal game with count obstacles spread evenly along the road
+    sim = GameSim(DIFFICULTY_PARAMS[1], seed=seed)
+    rng = random.Random(seed)
+    edge = ROAD_WIDTH/2.0 - OBSTACLE_SIZE
+    for i in range(count):
+        z = OBSTACLE_SPAWN_Z + (OBSTACLE_END_Z - OBSTACLE_SPAWN_Z) * i / count
+        color = (rng.random()*0.7 + 0.3, rng.random()*0.7 + 0.3, rng.random()*0.7 + 0.3)
+        sim.obstacles.spawn(rng.uniform(-edge, edge), GROUND_Y + OBSTACLE_SIZE / 2.0, z, OBSTACLE_SIZE, color)
+    sim.score = 1230
+    return sim
+
+def make_leaderboard(rows=LEADERBOARD_ROWS, seed=SEED):
+    store = LeaderboardStore(":memory:")
+    rng = random.Random(seed)
+    store.add_many([(f"2025-01-{i % 28 + 1:02d} 12:00:00", f"Player{i}", rng.randrange(10, 5000, 10),
+                     rng.choice(["Easy", "Normal", "Hard"])) for i in range(rows)])
+    return store
+
+class Renderer:
+    # The game's GL setup and one frame of main()'s render path, at quality tier
+    # `quality` (index into QUALITY_TIERS, default QUALITY_TIER)
+    def __init__(self, game, quality=None):
+        self.game = game
+        game.pg.display.init()
+        game.pg.font.init()
+        game.pg.display.set_mode((game.WIN_W, game.WIN_H), game.DOUBLEBUF | game.OPENGL)
+        game.init_gl()
+        game.build_car_meshes()
+        self.obstacle_renderer = game.ObstacleBatchRenderer()
+        self.scene_target = game.SceneTarget()
+        self.quality = game.QUALITY_TIERS[game.QUALITY_TIER if quality is None else quality]
+        game.apply_quality(self.quality, self.obstacle_renderer, self.scene_target)
+        self.text_cache = game.TextCache()
+        self.hud = game.Hud(self.text_cache)
+        self.hud_layer = game.HudLayer(self.hud)
+
+    def info(self):
+        game = self.game
+        return {
+            "renderer": game.glGetString(game.GL_RENDERER).decode(errors="replace"),
+            "gl_version": game.glGetString(game.GL_VERSION).decode(errors="replace"),
+            "python": platform.python_version(),
+            "pygame": game.pg.version.ver,
+            "immediate_mode": game.IMMEDIATE_MODE,
+            "instanced": self.obstacle_renderer.instanced,
+            "car_lods": [mesh.name for mesh in self.obstacle_renderer.meshes],
+            "hud_layer": self.hud_layer.cached,
+            "quality": self.quality["name"],
+            "resolution_scale": self.scene_target.scale,
+            "window": [game.WIN_W, game.WIN_H],
+        }
+
+    def draw(self, state, sim, leaderboard_view=None, alpha=1.0, replay=None):
+        # The scene as main() draws it, alpha of the way from the previous tick to the current one
+        game = self.game
+        player_x, track_offset, obstacle_shift = sim.lerp(alpha)
+        self.scene_target.begin()
+        game.glClear(game.GL_COLOR_BUFFER_BIT | game.GL_DEPTH_BUFFER_BIT)
+        game.draw_3d_sun()
+        game.glPushMatrix()
+        game.draw_racing_track(track_offset)
+        if state in ('playing', 'game_over', 'replay'):
+            game.draw_obstacles(self.obstacle_renderer, sim.obstacles, obstacle_shift)
+            game.draw_player(sim, player_x)
+        game.glPopMatrix()
+        self.scene_target.end()
+        game.begin_hud()
+        self.hud_layer.draw(state, sim, leaderboard_view=leaderboard_view, replay=replay)
+        game.end_hud()
+
+    def frame(self, state, sim, leaderboard_view=None, step=True):
+        if step:
+            sim.track_offset += TRACK_STEP
+        self.draw(state, sim, leaderboard_view)
+        # Wait for the frame to be rasterized, not just queued
+        self.game.glFinish()
+        self.game.pg.display.flip()
+
+    def close(self):
+        game = self.game
+        self.hud_layer.delete()
+        self.text_cache.clear()
+        self.obstacle_renderer.delete()
+        self.scene_target.delete()
+        game.delete_track_meshes()
+        game.delete_all_meshes()
+        game.pg.quit()
+
+class GLCallCounter:
+    # Counts calls to every gl*/glu* function the game module uses, by swapping
+    # its globals for counting wrappers while active
+    def __init__(self, module):
+        self.module = module
+        self.counts = {}
+        self._saved = {}
+
+    def _wrap(self, name, fn):
+        counts = self.counts
+        def counted(*args, **kwargs):
+            counts[name] = counts.get(name, 0) + 1
+            return fn(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        for name, value in list(vars(self.module).items()):
+            if name.startswith("gl") and callable(value):
+                self._saved[name] = value
+                setattr(self.module, name, self._wrap(name, value))
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self._saved.items():
+            setattr(self.module, name, value)
+        self._saved.clear()
+
+    def total(self):
+        return sum(self.counts.values())
+
+# ---------- Running ----------
+def run_scene(renderer, name, frames=BENCH_FRAMES, warmup=WARMUP_FRAMES):
+    state, count = SCENES[name]
+    sim = make_sim(count)
+    store = view = None
+    if state == 'leaderboard':
+        store = make_leaderboard()
+        view = LeaderboardView(store)
+    try:
+        for _ in range(warmup):
+            renderer.frame(state, sim, view)
+
+        times = np.empty((BENCH_ROUNDS, max(1, frames // BENCH_ROUNDS)))
+        for r in range(BENCH_ROUNDS):
+            for i in range(times.shape[1]):
+                start = time.perf_counter()
+                renderer.frame(state, sim, view)
+                times[r, i] = time.perf_counter() - start
+
+        with GLCallCounter(renderer.game) as counter:
+            for _ in range(COUNT_FRAMES):
+                renderer.frame(state, sim, view)
+
+        # Peak traced memory above the frame's starting point, i.e. what one
+        # frame allocates (and frees again), plus blocks still held afterwards
+        tracemalloc.start()
+        peaks = []
+        blocks_before = sys.getallocatedblocks()
+        for _ in range(ALLOC_FRAMES):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            renderer.frame(state, sim, view)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        retained = sys.getallocatedblocks() - blocks_before
+        tracemalloc.stop()
+    finally:
+        if store is not None:
+            store.close()
+
+    ms = times * 1000.0
+    best = ms[np.argmin(np.median(ms, axis=1))]
+    top_calls = sorted(counter.counts.items(), key=lambda kv: -kv[1])[:5]
+    return {
+        "fps": round(1000.0 / float(np.median(best)), 1),
+        "ms_p50": round(float(np.median(best)), 3),
+        "ms_p95": round(float(np.percentile(best, 95)), 3),
+        "gl_calls": round(counter.total() / COUNT_FRAMES, 1),
+        "top_gl_calls": {k: round(v / COUNT_FRAMES, 1) for k, v in top_calls},
+        "alloc_kb": round(float(np.median(peaks)) / 1024.0, 2),
+        "retained_blocks": retained,
+    }
+
+def soak_round(renderer, sim, view, sound_bank):
+    # One round of the soak run; sim is a live game driven by corridor_policy
+    game = renderer.game
+    for tier in game.QUALITY_TIERS:
+        game.apply_quality(tier, renderer.obstacle_renderer, renderer.scene_target)
+        for state in SOAK_STATES:
+            for _ in range(SOAK_FRAMES):
+                if state == 'playing':
+                    hits, scored = sim.step(corridor_policy(sim))
+                    if hits:
+                        sound_bank.play("crash")
+                    if scored:
+                        sound_bank.play("coin")
+                elif state == 'game_over':
+                    sim.score += 10  # new text every frame
+                renderer.frame(state, sim, view, step=state != 'playing')
+    # A fresh game and text cache each round, like going back to the menu
+    sim.seed += 1
+    sim.reset()
+    renderer.text_cache.clear()
+    game.apply_quality(renderer.quality, renderer.obstacle_renderer, renderer.scene_target)
+
+def run_soak(renderer, minutes):
+    # RESOURCES.growth() from the end of the first round to the end of the run
+    from assets import load_sound
+    game = renderer.game
+    game.pg.mixer.init()
+    sounds = {name: load_sound(path)[0] for name, path in game.SFX_FILES.items() if os.path.exists(path)}
+    sound_bank = game.SoundBank(sounds)
+    store = make_leaderboard()
+    view = LeaderboardView(store)
+    sim = GameSim(DIFFICULTY_PARAMS[DIFFICULTIES.index("Rush Hour")], seed=SEED)
+    try:
+        soak_round(renderer, sim, view, sound_bank)
+        baseline = game.RESOURCES.snapshot()
+        print("after warm-up:", game.RESOURCES.summary())
+        start = last_sample = time.perf_counter()
+        rounds = 0
+        while True:
+            soak_round(renderer, sim, view, sound_bank)
+            rounds += 1
+            now = time.perf_counter()
+            if now - start >= minutes * 60.0:
+                break
+            if now - last_sample >= SOAK_SAMPLE_INTERVAL:
+                last_sample = now
+                print(f"{(now - start) / 60.0:5.1f} min, {rounds} rounds:", game.RESOURCES.summary())
+        print(f"{(now - start) / 60.0:5.1f} min, {rounds} rounds:", game.RESOURCES.summary())
+        return game.RESOURCES.growth(baseline)
+    finally:
+        store.close()
+        sound_bank.sounds.clear()
+
+def compare(results, baseline, threshold):
+    # Returns a list of regression messages
+    problems = []
+    same_renderer = results["info"]["renderer"] == baseline["info"]["renderer"]
+    if not same_renderer:
+        print(f"Baseline was recorded on {baseline['info']['renderer']!r}, "
+              f"not {results['info']['renderer']!r}: skipping the fps check")
+    for name, res in results["scenes"].items():
+        base = baseline["scenes"].get(name)
+        if base is None:
+            continue
+        if same_renderer and res["fps"] < base["fps"] * (1.0 - threshold):
+            problems.append(f"{name}: {res['fps']} fps, baseline {base['fps']}")
+        if res["gl_calls"] > base["gl_calls"]:
+            problems.append(f"{name}: {res['gl_calls']} GL calls/frame, baseline {base['gl_calls']}")
+        if res["alloc_kb"] > base["alloc_kb"] * (1.0 + threshold) + ALLOC_SLACK_KB:
+            problems.append(f"{name}: {res['alloc_kb']} KB allocated/frame, baseline {base['alloc_kb']}")
+    return problems
+
+def print_results(results, baseline=None):
+    base_scenes = (baseline or {}).get("scenes", {})
+    print(f"{results['info']['renderer']} | {results['info']['gl_version']}")
+    print(f"{'scene':16} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'GL/frame':>9} {'KB/frame':>9}  baseline fps")
+    for name, res in results["scenes"].items():
+        base = base_scenes.get(name)
+        base_fps = f"{base['fps']:>8}" if base else "       -"
+        print(f"{name:16} {res['fps']:>8} {res['ms_p50']:>8} {res['ms_p95']:>8} "
+              f"{res['gl_calls']:>9} {res['alloc_kb']:>9}  {base_fps}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Car Dodge rendering on scripted scenes.")
+    parser.add_argument("--headless", action="store_true", help="render offscreen on Mesa llvmpipe")
+    parser.add_argument("--scenes", nargs="+", choices=list(SCENES), default=list(SCENES))
+    parser.add_argument("--frames", type=int, default=BENCH_FRAMES)
+    parser.add_argument("--warmup", type=int, default=WARMUP_FRAMES)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed fps drop / allocation growth as a fraction")
+    parser.add_argument("--immediate", action="store_true", help="draw with IMMEDIATE_MODE on")
+    parser.add_argument("--no-instancing", action="store_true", help="draw obstacles with merged client arrays")
+    parser.add_argument("--no-lod", action="store_true", help="draw every obstacle with the full car model")
+    parser.add_argument("--no-hud-layer", action="store_true", help="draw the HUD straight to the screen every frame")
+    parser.add_argument("--quality", help="quality tier by name (default: project.QUALITY_TIER)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--soak", type=float, metavar="MINUTES",
+                        help="instead of benchmarking, cycle every screen for this long and fail on resource growth")
+    args = parser.parse_args()
+
+    if args.headless:
+        use_headless_gl()
+    import project as game  # after the environment is set up
+    game.IMMEDIATE_MODE = args.immediate
+    game.INSTANCED_RENDERING = not args.no_instancing
+    game.CAR_LOD = not args.no_lod
+    game.HUD_LAYER = not args.no_hud_layer
+    tiers = [tier["name"] for tier in game.QUALITY_TIERS]
+    if args.quality is not None and args.quality not in tiers:
+        parser.error(f"--quality must be one of {', '.join(tiers)}")
+
+    renderer = Renderer(game, tiers.index(args.quality) if args.quality else None)
+    if args.soak is not None:
+        try:
+            grown = run_soak(renderer, args.soak)
+        finally:
+            renderer.close()
+        for kind, before, after, labels in grown:
+            print(f"LEAK {kind}: {before} -> {after} alive", labels)
+        if grown:
+            sys.exit(1)
+        print("No resource growth")
+        return
+
+    try:
+        results = {"info": renderer.info(), "frames": args.frames, "scenes": {}}
+        for name in args.scenes:
+            results["scenes"][name] = run_scene(renderer, name, args.frames, args.warmup)
+    finally:
+        renderer.close()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Baseline saved:", args.baseline)
+        return
+    if baseline is None:
+        print("No baseline yet; run with --save-baseline")
+        return
+    problems = compare(results, baseline, args.threshold)
+    for problem in problems:
+        print("REGRESSION", problem)
+    if problems:
+        sys.exit(1)
+    print("No regressions")
+
+if __name__ == "__main__":
+    main()
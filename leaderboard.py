@@ -0,0 +1,332 @@
+import argparse
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from simulation import DIFFICULTIES
+
+# Leaderboard storage. Scores go to a SQLite database with indexes for top-N
+# queries (overall, per player, per difficulty). The plain text file keeps
+# getting one "ts | name | score | difficulty" line per game as a human-readable
+# log, and older text files (no difficulty) can be imported incrementally.
+# The game hands scores to LeaderboardWriter, which does all file and database
+# work on a background thread.
+#
+#   python leaderboard.py import CarDodge_Leaderboard.txt
+#   python leaderboard.py top -n 10 --difficulty Hard
+
+# Leaderboard files (absolute path - set to your folder)
+LEADERBOARD_PATH = r"CarDodge_Leaderboard.txt"
+LEADERBOARD_DB_PATH = r"CarDodge_Leaderboard.db"
+LEADERBOARD_SHOW_COUNT = 10  # how many entries to show
+
+# Background writer
+FSYNC_POLICY = "batch"       # 'always' (after every score), 'batch' (once per batch) or 'never'
+WRITER_QUEUE_SIZE = 256      # scores waiting to be written before submit() blocks
+WRITER_BATCH_SIZE = 64       # most scores written in one go
+WRITER_BATCH_WAIT = 0.05     # seconds to wait for more scores before writing a batch
+
+# Ensure leaderboard directory exists
+try:
+    os.makedirs(os.path.dirname(LEADERBOARD_PATH), exist_ok=True)
+except Exception:
+    pass
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    difficulty TEXT
+);
+-- NULLs are distinct in a UNIQUE index, so a missing difficulty is keyed as ''
+CREATE UNIQUE INDEX IF NOT EXISTS scores_entry ON scores(ts, name, score, IFNULL(difficulty, ''));
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+
+# Indexes behind the top-N queries. Dropped during big imports and rebuilt
+# afterwards, which is much faster than updating them row by row.
+QUERY_INDEXES = """
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores(score DESC, id);
+CREATE INDEX IF NOT EXISTS scores_by_name ON scores(name, score DESC, id);
+CREATE INDEX IF NOT EXISTS scores_by_difficulty ON scores(difficulty, score DESC, id);
+"""
+BULK_IMPORT_BYTES = 4 * 1024 * 1024
+
+# ---------- Text format ----------
+def clean_name(name):
+    name = (name or "").replace("|", "/").replace("\n", " ").strip()
+    return name or "Player"
+
+def format_line(ts, name, score, difficulty=None):
+    line = f"{ts} | {clean_name(name)} | {score}"
+    if difficulty:
+        line += f" | {difficulty}"
+    return line + "\n"
+
+def parse_line(line):
+    # Returns (ts, name, score, difficulty) or None for a malformed line.
+    # Lines written before difficulties were recorded have three fields.
+    parts = [p.strip() for p in line.strip().split("|")]
+    if len(parts) < 3:
+        return None
+    difficulty = None
+    if len(parts) >= 4 and parts[-1] in DIFFICULTIES:
+        difficulty = parts.pop()
+    ts, score = parts[0], parts[-1]
+    name = "|".join(parts[1:-1]).strip()
+    if not valid_timestamp(ts) or not ascii_digits(score):
+        return None
+    return ts, name or "Player", int(score), difficulty
+
+def valid_timestamp(ts):
+    # "YYYY-MM-DD HH:MM:SS"; a shape check is enough and much cheaper than strptime
+    return (len(ts) == 19 and ts[4] == "-" and ts[7] == "-" and ts[10] == " "
+            and ts[13] == ":" and ts[16] == ":"
+            and ascii_digits(ts[:4] + ts[5:7] + ts[8:10] + ts[11:13] + ts[14:16] + ts[17:]))
+
+def ascii_digits(text):
+    # 0-9 only: str.isdigit() also takes "²" and other digits int() rejects
+    return text.isascii() and text.isdecimal()
+
+def timestamp():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# ---------- Store ----------
+class LeaderboardStore:
+    def __init__(self, db_path=None):
+        self.db_path = db_path = db_path or LEADERBOARD_DB_PATH
+        self.conn = sqlite3.connect(db_path, timeout=30.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(QUERY_INDEXES)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def add_many(self, entries):
+        # entries: iterable of (ts, name, score, difficulty). Re-adding an
+        # identical entry is a no-op, so imports can safely overlap.
+        with self.conn:
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO scores (ts, name, score, difficulty) VALUES (?, ?, ?, ?)",
+                entries)
+        return cur.rowcount
+
+    def add(self, ts, name, score, difficulty=None):
+        return self.add_many([(ts, clean_name(name), score, difficulty)])
+
+    def import_text(self, path=None, batch=10000):
+        # Imports lines appended to a text leaderboard since the last import.
+        # Returns how many new entries were added.
+        path = os.path.abspath(path or LEADERBOARD_PATH)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        row = self.conn.execute("SELECT offset FROM imports WHERE path = ?", (path,)).fetchone()
+        offset = row[0] if row else 0
+        if offset > size:
+            offset = 0  # file was replaced; duplicates are ignored
+        bulk = size - offset > BULK_IMPORT_BYTES
+        if bulk:
+            self.conn.executescript("DROP INDEX scores_by_score; DROP INDEX scores_by_name; "
+                                    "DROP INDEX scores_by_difficulty;")
+        added = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            entries = []
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # last line still being written; pick it up next time
+                offset += len(raw)
+                entry = parse_line(raw.decode("utf-8", errors="replace"))
+                if entry is not None:
+                    entries.append(entry)
+                if len(entries) >= batch:
+                    added += self.add_many(entries)
+                    entries = []
+            added += self.add_many(entries)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO imports (path, offset) VALUES (?, ?)", (path, offset))
+        if bulk:
+            self.conn.executescript(QUERY_INDEXES)
+        return added
+
+    def top(self, n=LEADERBOARD_SHOW_COUNT, name=None, difficulty=None):
+        # Best scores, highest first; each filter is served by its own index
+        query = "SELECT ts, name, score, difficulty FROM scores"
+        where, args = [], []
+        if name is not None:
+            where.append("name = ?")
+            args.append(name)
+        if difficulty is not None:
+            where.append("difficulty = ?")
+            args.append(difficulty)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY score DESC, id LIMIT ?"
+        return self.conn.execute(query, args + [n]).fetchall()
+
+    def recent(self, n=LEADERBOARD_SHOW_COUNT):
+        return self.conn.execute(
+            "SELECT ts, name, score, difficulty FROM scores ORDER BY id DESC LIMIT ?", (n,)).fetchall()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def data_version(self):
+        # Changes whenever any connection commits, so callers can cache query results
+        return (self.conn.total_changes, self.conn.execute("PRAGMA data_version").fetchone()[0])
+
+class LeaderboardView:
+    # Top-N rows for the leaderboard screen, re-queried only when the scope or
+    # the underlying data changes, never on every frame.
+    SCOPES = [None] + DIFFICULTIES
+
+    def __init__(self, store, n=LEADERBOARD_SHOW_COUNT):
+        self.store = store
+        self.n = n
+        self.scope_index = 0
+        self._key = None
+        self._rows = []
+
+    @property
+    def scope(self):
+        return self.SCOPES[self.scope_index]
+
+    def cycle(self, step):
+        self.scope_index = (self.scope_index + step) % len(self.SCOPES)
+
+    def rows(self):
+        key = (self.scope_index, self.store.data_version())
+        if key != self._key:
+            self._rows = self.store.top(self.n, difficulty=self.scope)
+            self._key = key
+        return self._rows
+
+# ---------- Background writer ----------
+class LeaderboardWriter(threading.Thread):
+    # Writes scores off the game thread. Each batch is first appended to the text
+    # leaderboard, which doubles as the journal, and synced per fsync_policy. It
+    # is then inserted into the database. On start the writer imports whatever
+    # the journal has that the database lacks, so a kill between the two steps
+    # loses nothing.
+    _STOP = object()
+
+    def __init__(self, text_path=None, db_path=None, fsync_policy=None,
+                 queue_size=WRITER_QUEUE_SIZE, batch_size=WRITER_BATCH_SIZE, batch_wait=WRITER_BATCH_WAIT):
+        super().__init__(name="leaderboard-writer", daemon=True)
+        self.text_path = text_path or LEADERBOARD_PATH
+        self.db_path = db_path or LEADERBOARD_DB_PATH
+        self.fsync_policy = fsync_policy or FSYNC_POLICY
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, name, score, difficulty=None):
+        # Called from the game thread; only blocks if the queue is full
+        entry = (timestamp(), clean_name(name), int(score), difficulty)
+        self.queue.put(entry)
+        return entry
+
+    def close(self, timeout=10.0):
+        # Writes everything still queued, then stops the thread
+        if self.is_alive():
+            self.queue.put(self._STOP)
+            self.join(timeout)
+
+    def run(self):
+        store = LeaderboardStore(self.db_path)
+        try:
+            store.import_text(self.text_path)
+        except Exception as e:
+            print("Failed to import leaderboard:", e)
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.batch_wait
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if stopping:
+                # Drain anything submitted before close()
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not self._STOP:
+                        batch.append(item)
+            if batch:
+                self._write_batch(store, batch)
+        store.close()
+
+    def _write_batch(self, store, batch):
+        try:
+            with open(self.text_path, "a", encoding="utf-8") as f:
+                for entry in batch:
+                    f.write(format_line(*entry))
+                    if self.fsync_policy == "always":
+                        f.flush()
+                        os.fsync(f.fileno())
+                if self.fsync_policy == "batch":
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            self.failed += len(batch)
+            print("Failed to write leaderboard:", e)
+        else:
+            self.written += len(batch)
+            for entry in batch:
+                print("Score saved:", format_line(*entry).strip())
+        try:
+            store.add_many(batch)
+        except Exception as e:
+            print("Failed to update leaderboard database:", e)
+
+def main():
+    parser = argparse.ArgumentParser(description="Car Dodge leaderboard database.")
+    parser.add_argument("--db", default=LEADERBOARD_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="import text leaderboard files (only new lines)")
+    imp.add_argument("paths", nargs="+")
+    top = sub.add_parser("top", help="show the best scores")
+    top.add_argument("-n", type=int, default=LEADERBOARD_SHOW_COUNT)
+    top.add_argument("--name")
+    top.add_argument("--difficulty", choices=DIFFICULTIES)
+    args = parser.parse_args()
+
+    store = LeaderboardStore(args.db)
+    if args.command == "import":
+        for path in args.paths:
+            print(f"{path}: {store.import_text(path)} new entries")
+        print(f"{store.count()} entries in {args.db}")
+    else:
+        for i, (ts, name, score, difficulty) in enumerate(store.top(args.n, args.name, args.difficulty)):
+            print(f"{i+1:3}. {score:8}  {name:12}  {difficulty or '-':6}  {ts}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
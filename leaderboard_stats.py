@@ -0,0 +1,382 @@
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from simulation import DIFFICULTIES
+from leaderboard import LEADERBOARD_PATH, parse_line
+
+# Leaderboard analytics straight from text leaderboard files, however large.
+# Files are memory-mapped and parsed a chunk at a time with NumPy: newline and
+# "|" positions are found for the whole chunk at once, and timestamps, scores,
+# names and difficulties are validated and decoded as arrays. Only lines the
+# array parser can't vouch for (a "|" inside a name, odd whitespace, huge
+# numbers) go through leaderboard.parse_line, so results match the importer.
+# Aggregates are merged after every chunk and pages already parsed are dropped,
+# so memory stays flat whatever the file size.
+#
+#   python leaderboard_stats.py CarDodge_Leaderboard.txt backups/*.txt
+#   python leaderboard_stats.py --player Sam --difficulty Hard --bin 50
+#   python leaderboard_stats.py big.txt --json stats.json
+
+CHUNK_BYTES = 16 * 1024 * 1024
+HISTOGRAM_BIN = 100     # score range of one histogram bar
+MAX_NAME_BYTES = 64     # longer names are left to parse_line
+MAX_SCORE_DIGITS = 18   # fits int64
+MAX_SCORE = np.iinfo(np.int64).max  # longer numbers parse_line accepts are clamped to this
+HISTOGRAM_MAX_BINS = 10000  # the last bin takes every higher score
+DAY_SPAN_BINCOUNT = 1 << 20  # count days with bincount when a chunk's YYYYMMDD values span less than this
+
+NEWLINE, CR, BAR = ord("\n"), ord("\r"), ord("|")
+TS_LEN = 19  # "YYYY-MM-DD HH:MM:SS"
+TS_PATTERN = np.frombuffer(b"0000-00-00 00:00:00", dtype=np.uint8)
+TS_IS_DIGIT = TS_PATTERN == ord("0")
+TS_DATE_WEIGHTS = np.zeros(TS_LEN, dtype=np.int32)  # digits of the date -> YYYYMMDD
+TS_DATE_WEIGHTS[[0, 1, 2, 3, 5, 6, 8, 9]] = 10 ** np.arange(7, -1, -1)
+
+DIFFICULTY_WIDTH = -(-max(len(d) for d in DIFFICULTIES) // 8) * 8
+DIFFICULTY_WORDS = [np.frombuffer(d.encode("ascii").ljust(DIFFICULTY_WIDTH, b"\0"), dtype=np.uint64)
+                    for d in DIFFICULTIES]
+
+# What str.strip() removes, for ASCII
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True
+
+# ---------- Chunk parsing ----------
+PAD = 128  # zero bytes around each chunk, so fixed-width reads never run off either end
+WORD_HASH = np.arange(1, MAX_NAME_BYTES // 8 + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15) | np.uint64(1)
+
+def padded(chunk):
+    buf = np.zeros(len(chunk) + 2 * PAD, dtype=np.uint8)
+    buf[PAD:PAD + len(chunk)] = chunk
+    return buf
+
+def _gather(buf, first, width):
+    # (len(first), width) bytes starting at each of first
+    return sliding_window_view(buf, width)[first]
+
+def _strip(buf, starts, ends):
+    # Field bounds with surrounding whitespace removed, like str.strip()
+    starts, ends = starts.copy(), ends.copy()
+    while True:
+        move = (starts < ends) & WHITESPACE[buf[starts]]
+        if not move.any():
+            break
+        starts += move
+    while True:
+        move = (ends > starts) & WHITESPACE[buf[ends - 1]]
+        if not move.any():
+            break
+        ends -= move
+    return starts, ends
+
+def _field_bytes(buf, starts, lengths, width):
+    # (n, width) bytes of each field, zeroed past its length
+    out = _gather(buf, starts, width).copy()
+    out[np.arange(width) >= lengths[:, None]] = 0
+    return out
+
+def _digits(buf, starts, ends, width):
+    # Right-aligned digit matrix of each field (zeros on the left) and whether
+    # every byte of the field is an ASCII digit
+    digits = _gather(buf, ends - width, width) - np.uint8(ord("0"))  # non-digits wrap to > 9
+    inside = np.arange(width) >= (width - (ends - starts))[:, None]
+    ok = ((digits <= 9) | ~inside).all(axis=1)
+    digits[~inside] = 0
+    return digits, ok
+
+def _unique_names(names):
+    # Distinct rows of a zero-padded (n, 8 * k) name matrix as bytes, and the
+    # index of each row among them. Rows are compared as k 64-bit words; with
+    # more than one word they are grouped by a hash of the words, which is
+    # checked against the words themselves and never trusted blindly.
+    width = names.shape[1]
+    words = np.ascontiguousarray(names).view(np.uint64)
+    if width == 8:
+        _, inverse = np.unique(words[:, 0], return_inverse=True)
+    else:
+        _, inverse = np.unique(words @ WORD_HASH[:width // 8], return_inverse=True)
+    first = np.empty(inverse.max(initial=-1) + 1, dtype=np.int64)
+    first[inverse] = np.arange(len(inverse))  # any row of each group
+    if width > 8 and not (words[first][inverse] == words).all():
+        _, first, inverse = np.unique(words.view(f"S{width}").ravel(), return_index=True, return_inverse=True)
+    return names[first].view(f"S{width}").ravel(), inverse
+
+def parse_chunk(buf):
+    # Parses a padded() block of whole lines. Returns (parsed, slow, lines):
+    # parsed holds the entries decoded here as arrays (see LeaderboardStats.add),
+    # slow the (start, end) byte ranges of lines to hand to parse_line.
+    nl = np.flatnonzero(buf == NEWLINE)
+    line_starts = np.empty_like(nl)
+    line_starts[:1] = PAD
+    line_starts[1:] = nl[:-1] + 1
+    line_ends = nl - ((nl > line_starts) & (buf[nl - 1] == CR))
+
+    bars = np.flatnonzero(buf == BAR)
+    first_bar = np.searchsorted(bars, line_starts)
+    bar_count = np.searchsorted(bars, line_ends) - first_bar
+    # Fewer than two bars can't be an entry; more than three mean a "|" in the name
+    many = np.flatnonzero(bar_count > 3)
+    cand = np.flatnonzero((bar_count == 2) | (bar_count == 3))
+    starts, ends, first_bar = line_starts[cand], line_ends[cand], first_bar[cand]
+    three = bar_count[cand] == 3
+    b0 = bars[first_bar]
+    b1 = bars[first_bar + 1]
+    b2 = bars[np.minimum(first_bar + 2, len(bars) - 1)]
+
+    # Fields: ts | name | score [| difficulty]
+    ts0, ts1 = _strip(buf, starts, b0)
+    name0, name1 = _strip(buf, b0 + 1, b1)
+    score0, score1 = _strip(buf, b1 + 1, np.where(three, b2, ends))
+    with_diff = np.flatnonzero(three)
+    diff0, diff1 = _strip(buf, b2[with_diff] + 1, ends[with_diff])
+
+    # Lines the array code can't settle exactly go to parse_line: a non-ASCII
+    # byte at a field edge (Unicode whitespace or digits), an unknown last
+    # field (a "|" in the name), or very long names and numbers
+    odd = np.zeros(len(cand), dtype=bool)
+    for f0, f1 in ((ts0, ts1), (name0, name1), (score0, score1)):
+        odd |= (f1 > f0) & ((buf[f0] >= 0x80) | (buf[f1 - 1] >= 0x80))
+    difficulty = np.zeros(len(cand), dtype=np.int8)  # 0 = none, else DIFFICULTIES index + 1
+    diff_len = diff1 - diff0
+    diff_words = _field_bytes(buf, diff0, np.minimum(diff_len, DIFFICULTY_WIDTH), DIFFICULTY_WIDTH).view(np.uint64)
+    for code, words in enumerate(DIFFICULTY_WORDS, 1):
+        match = (diff_words == words).all(axis=1) & (diff_len == len(DIFFICULTIES[code - 1]))
+        difficulty[with_diff[match]] = code
+    odd |= three & (difficulty == 0)
+    score_len = score1 - score0
+    name_len = name1 - name0
+    odd |= (score_len > MAX_SCORE_DIGITS) | (name_len > MAX_NAME_BYTES)
+
+    # Everything else is either a valid entry or a line parse_line would reject
+    ts = _gather(buf, ts0, TS_LEN) - TS_PATTERN  # digits 0-9 where the pattern has "0", 0 on separators
+    valid = ((ts1 - ts0 == TS_LEN)
+             & np.where(TS_IS_DIGIT, ts <= 9, ts == 0).all(axis=1)
+             & (score_len > 0))
+    width = int(np.clip(score_len.max(initial=1), 1, MAX_SCORE_DIGITS))
+    digits, numeric = _digits(buf, score0, score1, width)
+    valid &= numeric & ~odd
+    keep = np.flatnonzero(valid)
+
+    days = (ts[keep].astype(np.int32) @ TS_DATE_WEIGHTS).astype(np.int64)  # YYYYMMDD
+    scores = digits[keep].astype(np.int64) @ (10 ** np.arange(width - 1, -1, -1, dtype=np.int64))
+    name_len = name_len[keep]
+    name_width = -(-max(1, int(name_len.max(initial=1))) // 8) * 8
+    names, players = _unique_names(_field_bytes(buf, name0[keep], name_len, name_width))
+    parsed = {"names": names, "players": players, "scores": scores, "days": days, "difficulty": difficulty[keep]}
+
+    slow = np.sort(np.concatenate([many, cand[odd]]))
+    return parsed, np.stack([line_starts[slow], line_ends[slow]], axis=1), len(nl)
+
+def parse_slow(buf, ranges):
+    # The same arrays as parse_chunk() returns, for the given lines through parse_line
+    names, scores, days, difficulty = [], [], [], []
+    for start, end in ranges:
+        entry = parse_line(buf[start:end].tobytes().decode("utf-8", errors="replace"))
+        if entry is None:
+            continue
+        ts, name, score, diff = entry
+        names.append(name.encode("utf-8"))
+        scores.append(min(score, MAX_SCORE))
+        days.append(int(ts[:4] + ts[5:7] + ts[8:10]))
+        difficulty.append(DIFFICULTIES.index(diff) + 1 if diff else 0)
+    names, players = np.unique(np.array(names, dtype=bytes) if names else np.array([], dtype="S1"),
+                               return_inverse=True)
+    return {"names": names, "players": players, "scores": np.array(scores, dtype=np.int64),
+            "days": np.array(days, dtype=np.int64), "difficulty": np.array(difficulty, dtype=np.int8)}
+
+# ---------- Aggregates ----------
+class LeaderboardStats:
+    # Per-player best / total / games, a score histogram and games per day,
+    # merged from parsed chunks. player and difficulty restrict what is counted.
+    def __init__(self, bin_width=HISTOGRAM_BIN, player=None, difficulty=None):
+        self.bin_width = bin_width
+        self.player = player
+        self.difficulty = DIFFICULTIES.index(difficulty) + 1 if difficulty else None
+        self.players = {}    # name -> row in the arrays below
+        self.best = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0, dtype=np.int64)
+        self.games = np.zeros(0, dtype=np.int64)
+        self.histogram = np.zeros(0, dtype=np.int64)
+        self.per_day = {}    # YYYYMMDD -> games
+        self.lines = 0
+        self.entries = 0
+        self.slow_lines = 0
+        self.unterminated = 0
+        self.bytes = 0
+        self.files = 0
+
+    def add(self, parsed):
+        # parsed: distinct "names" (bytes), then per entry "players" (index into
+        # names), "scores", "days" (YYYYMMDD) and "difficulty" (0 or DIFFICULTIES index + 1)
+        players, scores, days = parsed["players"], parsed["scores"], parsed["days"]
+        rows = np.array([self._row(name) for name in parsed["names"]], dtype=np.int64)
+        keep = rows[players] >= 0
+        if self.difficulty is not None:
+            keep &= parsed["difficulty"] == self.difficulty
+        if not keep.all():
+            players, scores, days = players[keep], scores[keep], days[keep]
+        if not len(scores):
+            return
+        entry_rows = rows[players]
+        np.maximum.at(self.best, entry_rows, scores)
+        np.add.at(self.total, entry_rows, scores)
+        self.games += np.bincount(entry_rows, minlength=len(self.games))
+
+        counts = np.bincount(np.minimum(scores // self.bin_width, HISTOGRAM_MAX_BINS - 1))
+        if len(counts) > len(self.histogram):
+            self.histogram = np.concatenate([self.histogram, np.zeros(len(counts) - len(self.histogram), np.int64)])
+        self.histogram[:len(counts)] += counts
+        first_day = int(days.min())
+        if days.max() - first_day < DAY_SPAN_BINCOUNT:
+            counts = np.bincount(days - first_day)
+            present = np.flatnonzero(counts)
+            day_counts = zip(present + first_day, counts[present])
+        else:
+            day_counts = zip(*np.unique(days, return_counts=True))
+        for day, n in day_counts:
+            self.per_day[int(day)] = self.per_day.get(int(day), 0) + int(n)
+        self.entries += len(scores)
+
+    def _row(self, raw_name):
+        # Row of a player, added on first sight; -1 for names filtered out
+        name = raw_name.decode("utf-8", errors="replace") or "Player"
+        if self.player is not None and name != self.player:
+            return -1
+        row = self.players.get(name)
+        if row is None:
+            row = self.players[name] = len(self.players)
+            if row == len(self.best):
+                grow = max(1024, len(self.best))
+                self.best = np.concatenate([self.best, np.zeros(grow, np.int64)])
+                self.total = np.concatenate([self.total, np.zeros(grow, np.int64)])
+                self.games = np.concatenate([self.games, np.zeros(grow, np.int64)])
+        return row
+
+    def scan(self, path, chunk_bytes=CHUNK_BYTES):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.files += 1
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                self._scan_mapped(mm, size, chunk_bytes)
+
+    def _scan_mapped(self, mm, size, chunk_bytes):
+        # Kept apart from scan() so no array views of the map outlive it
+        data = np.frombuffer(mm, dtype=np.uint8)
+        try:
+            pos = 0
+            while pos < size:
+                end = min(pos + chunk_bytes, size)
+                nl = mm.rfind(b"\n", pos, end)
+                while nl < 0 and end < size:
+                    end = min(end + chunk_bytes, size)  # a line longer than a chunk
+                    nl = mm.rfind(b"\n", pos, end)
+                if nl < 0:
+                    break
+                buf = padded(data[pos:nl + 1])
+                parsed, slow, lines = parse_chunk(buf)
+                self.add(parsed)
+                if len(slow):
+                    self.add(parse_slow(buf, slow))
+                self.lines += lines
+                self.slow_lines += len(slow)
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    # Parsed pages won't be read again
+                    page = pos - pos % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, page, nl + 1 - page)
+                pos = nl + 1
+        finally:
+            del data  # a live view would keep the map from closing and hide the real error
+        # Last line still being written (or missing its newline): left out, like the importer does
+        self.unterminated += pos < size
+        self.bytes += size
+
+    def player_rows(self):
+        # [(name, best, mean, games)], best first
+        n = len(self.players)
+        names = list(self.players)
+        order = np.lexsort((-self.games[:n], -self.best[:n]))
+        return [(names[i], int(self.best[i]), self.total[i] / self.games[i], int(self.games[i]))
+                for i in order if self.games[i]]
+
+    def histogram_rows(self):
+        # [(low, high, games)] for every non-empty bin; high is None for the open-ended last bin
+        return [(i * self.bin_width, (i + 1) * self.bin_width - 1 if i < HISTOGRAM_MAX_BINS - 1 else None, int(n))
+                for i, n in enumerate(self.histogram) if n]
+
+    def day_rows(self):
+        # [("YYYY-MM-DD", games)], oldest first
+        return [(f"{d // 10000:04d}-{d // 100 % 100:02d}-{d % 100:02d}", n) for d, n in sorted(self.per_day.items())]
+
+    def to_dict(self):
+        return {
+            "files": self.files, "bytes": self.bytes, "lines": self.lines, "entries": self.entries,
+            "slow_lines": self.slow_lines, "unterminated": self.unterminated,
+            "players": [{"name": name, "best": best, "mean": round(mean, 3), "games": games}
+                        for name, best, mean, games in self.player_rows()],
+            "histogram": [{"low": low, "high": high, "games": n} for low, high, n in self.histogram_rows()],
+            "per_day": dict(self.day_rows()),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Player statistics from Car Dodge text leaderboards.")
+    parser.add_argument("paths", nargs="*", help=f"leaderboard files (default: {LEADERBOARD_PATH})")
+    parser.add_argument("--player", help="only this player's games")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, help="only games at this difficulty")
+    parser.add_argument("--bin", type=int, default=HISTOGRAM_BIN, help="histogram bin width")
+    parser.add_argument("--top", type=int, default=20, help="players to list")
+    parser.add_argument("--days", type=int, default=14, help="most recent days to list")
+    parser.add_argument("--json", help="write every aggregate to this file")
+    args = parser.parse_args()
+
+    stats = LeaderboardStats(args.bin, args.player, args.difficulty)
+    start = time.perf_counter()
+    for path in args.paths or [LEADERBOARD_PATH]:
+        try:
+            stats.scan(path)
+        except OSError as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    malformed = stats.lines - stats.entries if args.player is None and args.difficulty is None else None
+    print(f"{stats.files} files, {stats.bytes / 1e6:.1f} MB, {stats.lines} lines, {stats.entries} games counted"
+          + (f", {malformed} malformed" if malformed is not None else "")
+          + f" ({stats.slow_lines} lines via the slow path) in {elapsed:.2f}s "
+          f"= {stats.bytes / 1e6 / max(elapsed, 1e-9):.0f} MB/s")
+
+    players = stats.player_rows()
+    print(f"\n{'player':16} {'best':>8} {'mean':>10} {'games':>8}")
+    for name, best, mean, games in players[:args.top]:
+        print(f"{name[:16]:16} {best:8} {mean:10.1f} {games:8}")
+    if len(players) > args.top:
+        print(f"... {len(players) - args.top} more players")
+
+    histogram = stats.histogram_rows()
+    if histogram:
+        print("\nscore histogram")
+        peak = max(n for _, _, n in histogram)
+        for low, high, n in histogram:
+            label = f"{low}-{high}" if high is not None else f"{low}+"
+            print(f"{label:>15} {n:9}  {'#' * max(1, round(40 * n / peak))}")
+
+    days = stats.day_rows()
+    if days:
+        print("\ngames per day")
+        for day, n in days[-args.days:]:
+            print(f"{day} {n:9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(stats.to_dict(), f, indent=2)
+
+if __name__ == "__main__":
+    main()
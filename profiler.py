@@ -0,0 +1,100 @@
+import csv
+import json
+import time
+
+import numpy as np
+
+# Per-phase frame profiler. The game loop calls begin_frame() at the top of a
+# frame and mark(phase) at the end of each phase; each phase's time is the time
+# since the previous mark. Samples go into a preallocated ring buffer written
+# only by the game thread (no locks, no per-frame allocation). Readers work on
+# copies via stats() / export_csv() / export_chrome_trace().
+
+PROFILER_FRAMES = 600  # frames kept in the ring buffer (10 s at 60 fps)
+
+class FrameProfiler:
+    def __init__(self, phases, frames=PROFILER_FRAMES):
+        self.phases = list(phases)
+        self.index = {name: i for i, name in enumerate(self.phases)}
+        self.frames = frames
+        self.frame_start = np.zeros(frames, dtype=np.float64)               # seconds (perf_counter)
+        self.starts = np.zeros((frames, len(self.phases)), dtype=np.float64)  # seconds (perf_counter)
+        self.durations = np.zeros((frames, len(self.phases)), dtype=np.float64)  # seconds
+        self.head = 0    # slot of the frame being recorded
+        self.count = 0   # completed frames in the buffer
+        self.frame_number = 0
+        self._last = 0.0
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        row = self.head
+        self.frame_start[row] = now
+        self.starts[row] = now
+        self.durations[row] = 0.0
+        self._last = now
+
+    def mark(self, phase):
+        # Ends `phase`: charges the time since the previous mark to it
+        now = time.perf_counter()
+        i = self.index[phase]
+        row = self.head
+        if self.durations[row, i] == 0.0:
+            self.starts[row, i] = self._last
+        self.durations[row, i] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        self.head = (self.head + 1) % self.frames
+        self.count = min(self.count + 1, self.frames)
+        self.frame_number += 1
+
+    def _rows(self):
+        # Completed rows, oldest first
+        if self.count < self.frames:
+            return np.arange(self.count)
+        return (np.arange(self.frames) + self.head) % self.frames
+
+    def frame_times(self):
+        # Total time of each completed frame in seconds, oldest first
+        return self.durations[self._rows()].sum(axis=1)
+
+    def stats(self, percentiles=(50, 95, 99)):
+        # {phase: [p50, p95, p99] in ms}, plus "frame" for whole frames
+        if self.count == 0:
+            return {}
+        rows = self._rows()
+        durations = self.durations[rows] * 1000.0
+        values = np.percentile(durations, percentiles, axis=0)
+        result = {name: values[:, i].tolist() for i, name in enumerate(self.phases)}
+        result["frame"] = np.percentile(durations.sum(axis=1), percentiles).tolist()
+        return result
+
+    def export_csv(self, path):
+        rows = self._rows()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + [f"{name}_ms" for name in self.phases] + ["total_ms"])
+            first = self.frame_number - len(rows)
+            for n, row in enumerate(rows):
+                ms = self.durations[row] * 1000.0
+                writer.writerow([first + n] + [f"{v:.4f}" for v in ms] + [f"{ms.sum():.4f}"])
+
+    def export_chrome_trace(self, path):
+        # Trace Event Format, viewable in chrome://tracing or Perfetto
+        rows = self._rows()
+        events = []
+        if len(rows):
+            origin = self.frame_start[rows[0]]
+            first = self.frame_number - len(rows)
+            for n, row in enumerate(rows):
+                frame_dur = self.durations[row].sum()
+                events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": round((self.frame_start[row] - origin) * 1e6, 1),
+                               "dur": round(frame_dur * 1e6, 1), "args": {"frame": first + n}})
+                for i, name in enumerate(self.phases):
+                    if self.durations[row, i] > 0.0:
+                        events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                                       "ts": round((self.starts[row, i] - origin) * 1e6, 1),
+                                       "dur": round(self.durations[row, i] * 1e6, 1)})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
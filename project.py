@@ -3,46 +3,68 @@ from pygame import mixer
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
-import random
+from OpenGL.GL import shaders
+import numpy as np
+import ctypes
+from collections import OrderedDict
 import time
-import datetime
-import os
 import math
+from simulation import (GameSim, DIFFICULTIES, DIFFICULTY_PARAMS, GROUND_Y, PLAYER_Y,
+                        PLAYER_Z, ROAD_WIDTH, SIM_HZ)
+from leaderboard import LeaderboardStore, LeaderboardView, LeaderboardWriter, timestamp
+from replay import Replay, ReplayPlayer, ReplayRecorder, input_bits, bits_move, list_replays, replay_path, PAUSE
+from profiler import FrameProfiler
+from quality import QualityGovernor
+from assets import AssetLoader, NORMAL, URGENT
+from resources import (RESOURCES, gen_texture, delete_textures, gen_buffer, delete_buffers,
+                       gen_framebuffer, delete_framebuffer, gen_renderbuffer, delete_renderbuffers,
+                       gen_list, delete_list, track_program, delete_program, new_quadric, delete_quadric)
 
 # ---------- User-uploaded file path (available locally) ----------
 UPLOADED_IMAGE_PATH = r"/mnt/data/c1434bc6-85de-4c0a-87cf-1487d18dc83d.png"
 
 # ---------- Configuration ----------
+# Gameplay constants (player, obstacles, difficulty presets) live in simulation.py
 WIN_W, WIN_H = 900, 600
-GROUND_Y = -1.5
-PLAYER_Y = GROUND_Y + 0.4
-PLAYER_Z = 0.0
-PLAYER_HALF_WIDTH = 0.9
-PLAYER_HALF_DEPTH = 0.6
-PLAYER_SPEED = 10.0
-OBSTACLE_SIZE = 1.5
-OBSTACLE_SPAWN_Z = -60.0
-OBSTACLE_END_Z = 4.0
-
-# Default gameplay params (will be overridden by difficulty)
-SPAWN_INTERVAL_DEFAULT = 1.0
-OBSTACLE_SPEED_START_DEFAULT = 18.0
-OBSTACLE_SPEED_INC_DEFAULT = 0.3
-MAX_LIVES = 3
 
 # Track appearance
-ROAD_WIDTH = 14.0
 STRIP_LENGTH = 4.0
-
-# Leaderboard file (absolute path - set to your folder)
-LEADERBOARD_PATH = r"CarDodge_Leaderboard.txt"
-LEADERBOARD_SHOW_COUNT = 10  # how many recent entries to show
-
-# Ensure leaderboard directory exists
-try:
-    os.makedirs(os.path.dirname(LEADERBOARD_PATH), exist_ok=True)
-except Exception:
-    pass
+TRACK_Z_FAR = -100.0   # far end of the visible road
+TRACK_Z_NEAR = 20.0    # near end (behind the camera's view)
+GRASS_HALF_WIDTH = 100.0
+FAR_PLANE = 200.0
+
+# Rendering path: False replays geometry cached on the GPU at startup,
+# True re-issues every glBegin/glEnd each frame (kept for A/B frame timing)
+IMMEDIATE_MODE = False
+# Draw all obstacles with one instanced call when the GL context supports it,
+# otherwise with one pre-transformed merged vertex array
+INSTANCED_RENDERING = True
+CAR_SCALE = 1.3  # cars are drawn slightly bigger than their collision box
+# Obstacle cars switch to simpler models with distance (see CAR_LODS);
+# False draws every car with the full model (kept for A/B frame timing)
+CAR_LOD = True
+# Keep the HUD in a cached texture that is redrawn only when its text changes;
+# False draws every string straight to the screen each frame (kept for A/B frame timing)
+HUD_LAYER = True
+# Step through QUALITY_TIERS at runtime to hold QUALITY_TARGET_FPS (see quality.py);
+# False stays on QUALITY_TIER
+ADAPTIVE_QUALITY = True
+QUALITY_TARGET_FPS = 60
+QUALITY_TIER = 0
+
+# Timing: the game updates in fixed steps of 1/UPDATE_HZ seconds whatever the
+# frame rate, and draws positions interpolated between the last two steps.
+# Keep UPDATE_HZ equal to simulation.SIM_HZ so games play out exactly like
+# headless ones.
+UPDATE_HZ = SIM_HZ
+FRAME_RATE_MODE = 'capped'  # 'capped' (FRAME_RATE_CAP), 'vsync' (display refresh) or 'uncapped'
+FRAME_RATE_CAP = 60
+MAX_FRAME_TIME = 0.25       # longer frames (hitches, dragging the window) are clipped to this
+MAX_STEPS_PER_FRAME = 8     # beyond this the update backlog is dropped instead of catching up
+IDLE_STATIC_STATES = True   # menus and other still screens sleep until input instead of redrawing (see STATES)
+
+RECORD_REPLAYS = True       # save every game's inputs to replays/ (see replay.py)
 
 # ---------- OpenGL setup ----------
 def init_gl():
@@ -65,10 +87,10 @@ def init_gl():
     light_pos = [15.0, 15.0, 10.0, 1.0]
     glLightfv(GL_LIGHT0, GL_POSITION, light_pos)
 
-def set_perspective():
+def set_perspective(far=FAR_PLANE):
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
-    gluPerspective(60.0, WIN_W / WIN_H, 0.1, 200.0)
+    gluPerspective(60.0, WIN_W / WIN_H, 0.1, far)
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
     glTranslatef(0.0, -0.6, -18.0)
@@ -90,46 +112,409 @@ def draw_cube(size=1.0):
     glNormal3f(1,0,0); glVertex3f( s,  s, -s); glVertex3f( s,  s,  s); glVertex3f( s, -s,  s); glVertex3f( s, -s, -s)
     glEnd()
 
+# ---------- Mesh cache ----------
+# Geometry that never changes is compiled once into GL display lists and
+# replayed with a single glCallList per draw.
+_mesh_cache = {}
+
+def compile_mesh(name, draw_fn):
+    delete_mesh(name)
+    list_id = gen_list(name)
+    glNewList(list_id, GL_COMPILE)
+    draw_fn()
+    glEndList()
+    _mesh_cache[name] = list_id
+    return list_id
+
+def call_mesh(name):
+    glCallList(_mesh_cache[name])
+
+def has_mesh(name):
+    return name in _mesh_cache
+
+def delete_mesh(name):
+    list_id = _mesh_cache.pop(name, None)
+    if list_id is not None:
+        delete_list(list_id)
+
+def delete_all_meshes():
+    for name in list(_mesh_cache):
+        delete_mesh(name)
+
+# ---------- Car model ----------
+# Each part is (color, translate, scale) applied to a unit cube.
+# A color of None means "use the car's body color".
+CAR_PARTS = [
+    (None,            (0.0, 0.0, 0.0),     (1.0, 0.4, 1.8)),    # 1. Body - flatten and stretch
+    ((0.2, 0.2, 0.2), (0.0, 0.35, -0.1),   (0.8, 0.35, 0.8)),   # 2. Cabin - dark grey windows
+    ((0.1, 0.1, 0.1), (-0.55, -0.2, 0.5),  (0.2, 0.3, 0.3)),    # 3. Wheels
+    ((0.1, 0.1, 0.1), (0.55, -0.2, 0.5),   (0.2, 0.3, 0.3)),
+    ((0.1, 0.1, 0.1), (-0.55, -0.2, -0.6), (0.2, 0.3, 0.3)),
+    ((0.1, 0.1, 0.1), (0.55, -0.2, -0.6),  (0.2, 0.3, 0.3)),
+    ((1.0, 1.0, 0.0), (0.0, 0.0, 0.91),    (0.8, 0.1, 0.05)),   # 4. Headlights
+]
+
+def draw_car_parts(parts):
+    # The body color must already be current; parts with their own color set it.
+    for color, (tx, ty, tz), (sx, sy, sz) in parts:
+        glPushMatrix()
+        if color is not None:
+            glColor3f(*color)
+        glTranslatef(tx, ty, tz)
+        glScalef(sx, sy, sz)
+        draw_cube(1.0)
+        glPopMatrix()
+
+def build_car_meshes():
+    # The body color is left out of the list so one mesh serves every car
+    compile_mesh("car", lambda: draw_car_parts(CAR_PARTS))
+
+# Simplified models for far away obstacle cars
+CAR_PARTS_SIMPLE = CAR_PARTS[:2]                                  # body and cabin
+CAR_PARTS_BOX = [(None, (0.0, 0.1, 0.0), (1.0, 0.6, 1.8))]        # one body-colored box
+
+# Levels of detail: (name, eye-space distance the level is used up to, parts).
+# Cars further than the last distance or outside the view frustum are skipped.
+# The camera is 18 units behind the player and cars spawn at z = -60 (~78 away).
+CAR_LODS = [
+    ("full", 35.0, CAR_PARTS),
+    ("simple", 55.0, CAR_PARTS_SIMPLE),
+    ("box", FAR_PLANE, CAR_PARTS_BOX),
+]
+
 # Builds a car using multiple scaled cubes (Body, Cabin, Wheels)
 def draw_car(color):
-    
-    # 1. Car Body
-    glPushMatrix()
     glColor3f(*color)
-    glScalef(1.0, 0.4, 1.8) # Flatten and stretch
-    draw_cube(1.0)
-    glPopMatrix()
+    if IMMEDIATE_MODE or not has_mesh("car"):
+        draw_car_parts(CAR_PARTS)
+    else:
+        call_mesh("car")
+
+# ---------- Batched obstacle rendering ----------
+# Same faces as draw_cube, as (normal, 4 corners) of a unit cube
+CUBE_FACES = [
+    ((0,0,1),  [( 1, 1, 1), (-1, 1, 1), (-1,-1, 1), ( 1,-1, 1)]),
+    ((0,0,-1), [( 1,-1,-1), (-1,-1,-1), (-1, 1,-1), ( 1, 1,-1)]),
+    ((0,1,0),  [( 1, 1,-1), (-1, 1,-1), (-1, 1, 1), ( 1, 1, 1)]),
+    ((0,-1,0), [( 1,-1, 1), (-1,-1, 1), (-1,-1,-1), ( 1,-1,-1)]),
+    ((-1,0,0), [(-1, 1, 1), (-1, 1,-1), (-1,-1,-1), (-1,-1, 1)]),
+    ((1,0,0),  [( 1, 1,-1), ( 1, 1, 1), ( 1,-1, 1), ( 1,-1,-1)]),
+]
+
+def build_car_arrays(parts, scale):
+    # Flattens a part list into quad vertex arrays in car space.
+    # Colors are RGBA where alpha 1 marks body vertices that take the per-car color.
+    # Normals are divided by the part scale the same way the fixed-function normal
+    # matrix does (GL_NORMALIZE is off), so lighting matches draw_car exactly.
+    positions, normals, colors = [], [], []
+    for color, translate, part_scale in parts:
+        t = np.array(translate, dtype=np.float32)
+        s = np.array(part_scale, dtype=np.float32)
+        rgba = (0.0, 0.0, 0.0, 1.0) if color is None else (color[0], color[1], color[2], 0.0)
+        for normal, corners in CUBE_FACES:
+            n = np.array(normal, dtype=np.float32) / (s * scale)
+            for corner in corners:
+                positions.append(t + s * np.array(corner, dtype=np.float32) * 0.5)
+                normals.append(n)
+                colors.append(rgba)
+    positions = np.array(positions, dtype=np.float32) * scale
+    return positions, np.array(normals, dtype=np.float32), np.array(colors, dtype=np.float32)
+
+INSTANCED_VERTEX_SHADER = """
+#version 120
+attribute vec3 inst_offset;
+attribute vec3 inst_color;
+varying vec4 v_color;
+void main() {
+    vec4 eye = gl_ModelViewMatrix * vec4(gl_Vertex.xyz + inst_offset, 1.0);
+    // Same lighting as the fixed-function path: LIGHT0 diffuse plus global ambient,
+    // material color from glColor (GL_COLOR_MATERIAL), no normalization.
+    vec3 base = mix(gl_Color.rgb, inst_color, gl_Color.a);
+    vec3 n = gl_NormalMatrix * gl_Normal;
+    vec3 l = normalize(gl_LightSource[0].position.xyz - eye.xyz);
+    vec3 light = gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+               + gl_LightSource[0].diffuse.rgb * max(dot(n, l), 0.0);
+    v_color = vec4(clamp(base * light, 0.0, 1.0), 1.0);
+    gl_Position = gl_ProjectionMatrix * eye;
+}
+"""
+
+INSTANCED_FRAGMENT_SHADER = """
+#version 120
+varying vec4 v_color;
+void main() {
+    gl_FragColor = v_color;
+}
+"""
+
+class CarMesh:
+    # One car model as quad vertex arrays, plus its vertex buffer when instancing
+    def __init__(self, name, parts, scale):
+        self.name = name
+        self.positions, self.normals, self.colors = build_car_arrays(parts, scale)
+        self.body_mask = self.colors[:, 3:4] > 0.5
+        self.vertex_count = len(self.positions)
+        self.radius = float(np.linalg.norm(self.positions, axis=1).max())
+        self.vbo = None
+
+class ObstacleBatchRenderer:
+    # Draws every obstacle car in a constant number of GL calls per level of detail.
+    # positions is an (N, 3) array of car centers, colors an (N, 3) array of body colors.
+    def __init__(self, lods=None, scale=CAR_SCALE):
+        if lods is None:
+            lods = CAR_LODS if CAR_LOD else [("full", FAR_PLANE, CAR_PARTS)]
+        self.meshes = [CarMesh(name, parts, scale) for name, _, parts in lods]
+        self.base_distances = np.array([distance for _, distance, _ in lods])
+        self.lod_distances = self.base_distances.copy()
+        self.radius = max(mesh.radius for mesh in self.meshes)
+        self.program = None
+        self.instance_vbo = None
+        # Cars drawn per level and culled, in the last draw() and in total
+        self.drawn = {mesh.name: 0 for mesh in self.meshes}
+        self.culled = 0
+        self.total_drawn = dict(self.drawn)
+        self.total_culled = 0
+        if INSTANCED_RENDERING:
+            self._init_instancing()
+
+    def _init_instancing(self):
+        if not (bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor)):
+            return
+        try:
+            program = shaders.compileProgram(
+                shaders.compileShader(INSTANCED_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(INSTANCED_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+            )
+        except Exception as e:
+            print("Instanced rendering unavailable, using merged arrays:", e)
+            return
+        self.program = track_program(program, "instanced cars")
+        self.offset_loc = glGetAttribLocation(program, "inst_offset")
+        self.color_loc = glGetAttribLocation(program, "inst_color")
+        for mesh in self.meshes:
+            interleaved = np.hstack([mesh.positions, mesh.normals, mesh.colors]).astype(np.float32)
+            mesh.vbo = gen_buffer(interleaved.nbytes, "car mesh")
+            glBindBuffer(GL_ARRAY_BUFFER, mesh.vbo)
+            glBufferData(GL_ARRAY_BUFFER, interleaved.nbytes, interleaved, GL_STATIC_DRAW)
+        self.instance_vbo = gen_buffer(0, "car instances")
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    @property
+    def instanced(self):
+        return self.program is not None
+
+    def set_detail(self, lod_scale=1.0, draw_distance=FAR_PLANE):
+        # Scales the distances where cars switch to simpler models (0 = simplest
+        # model everywhere) and skips cars further away than draw_distance
+        self.lod_distances = np.minimum(self.base_distances * lod_scale, draw_distance)
+        self.lod_distances[-1] = draw_distance
+
+    def classify(self, positions):
+        # Level of detail per car from its eye-space distance, -1 for cars that
+        # are too far or whose bounding sphere is outside the view frustum
+        modelview = np.array(glGetDoublev(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+        projection = np.array(glGetDoublev(GL_PROJECTION_MATRIX), dtype=np.float64).reshape(4, 4).T
+        clip = projection @ modelview
+        planes = np.array([clip[3] + clip[0], clip[3] - clip[0],    # left, right
+                           clip[3] + clip[1], clip[3] - clip[1],    # bottom, top
+                           clip[3] + clip[2], clip[3] - clip[2]])   # near, far
+        planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+        inside = (positions @ planes[:, :3].T + planes[:, 3] >= -self.radius).all(axis=1)
+        distance = -(positions @ modelview[2, :3] + modelview[2, 3])
+        level = np.searchsorted(self.lod_distances, distance)
+        level[~inside | (level >= len(self.meshes))] = -1
+        return level
+
+    def draw(self, positions, colors):
+        count = len(positions)
+        for mesh in self.meshes:
+            self.drawn[mesh.name] = 0
+        self.culled = 0
+        if count == 0:
+            return
+        level = self.classify(positions)
+        drawn = 0
+        for i, mesh in enumerate(self.meshes):
+            selected = level == i
+            n = int(np.count_nonzero(selected))
+            if n == 0:
+                continue
+            if n == count:
+                mesh_positions, mesh_colors = positions, colors
+            else:
+                mesh_positions, mesh_colors = positions[selected], colors[selected]
+            if self.instanced:
+                self._draw_instanced(mesh, mesh_positions, mesh_colors, n)
+            else:
+                self._draw_merged(mesh, mesh_positions, mesh_colors, n)
+            self.drawn[mesh.name] = n
+            self.total_drawn[mesh.name] += n
+            drawn += n
+        self.culled = count - drawn
+        self.total_culled += self.culled
+
+    def _draw_instanced(self, mesh, positions, colors, count):
+        instances = np.hstack([positions, colors]).astype(np.float32)
+        glUseProgram(self.program)
+
+        glBindBuffer(GL_ARRAY_BUFFER, mesh.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 40, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, 40, ctypes.c_void_p(12))
+        glColorPointer(4, GL_FLOAT, 40, ctypes.c_void_p(24))
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+        RESOURCES.set_bytes("buffer", self.instance_vbo, instances.nbytes)
+        for loc, offset in ((self.offset_loc, 0), (self.color_loc, 12)):
+            glEnableVertexAttribArray(loc)
+            glVertexAttribPointer(loc, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(offset))
+            glVertexAttribDivisor(loc, 1)
+
+        glDrawArraysInstanced(GL_QUADS, 0, mesh.vertex_count, count)
+
+        for loc in (self.offset_loc, self.color_loc):
+            glVertexAttribDivisor(loc, 0)
+            glDisableVertexAttribArray(loc)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+
+    def _draw_merged(self, mesh, positions, colors, count):
+        # Pre-transform every car into one big vertex array and draw it in one call
+        verts = (mesh.positions[None, :, :] + positions[:, None, :].astype(np.float32)).reshape(-1, 3)
+        normals = np.broadcast_to(mesh.normals, (count, mesh.vertex_count, 3)).reshape(-1, 3)
+        body = np.broadcast_to(colors[:, None, :].astype(np.float32), (count, mesh.vertex_count, 3))
+        rgb = np.where(mesh.body_mask[None, :, :], body, mesh.colors[None, :, :3]).reshape(-1, 3)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, np.ascontiguousarray(verts))
+        glNormalPointer(GL_FLOAT, 0, np.ascontiguousarray(normals))
+        glColorPointer(3, GL_FLOAT, 0, np.ascontiguousarray(rgb))
+        glDrawArrays(GL_QUADS, 0, count * mesh.vertex_count)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def delete(self):
+        if self.program is not None:
+            delete_buffers([mesh.vbo for mesh in self.meshes] + [self.instance_vbo])
+            delete_program(self.program)
+            self.program = None
 
-    # 2. Cabin (Top)
-    glPushMatrix()
-    glColor3f(0.2, 0.2, 0.2) # Dark grey windows
-    glTranslatef(0.0, 0.35, -0.1) 
-    glScalef(0.8, 0.35, 0.8)
-    draw_cube(1.0)
-    glPopMatrix()
 
-    # 3. Wheels
-    wheel_color = (0.1, 0.1, 0.1)
-    wheel_positions = [(-0.55, -0.2, 0.5), (0.55, -0.2, 0.5), (-0.55, -0.2, -0.6), (0.55, -0.2, -0.6)]
-    for wx, wy, wz in wheel_positions:
-        glPushMatrix()
-        glColor3f(*wheel_color)
-        glTranslatef(wx, wy, wz)
-        glScalef(0.2, 0.3, 0.3)
-        draw_cube(1.0)
-        glPopMatrix()
+# ---------- Racing Track ----------
+# The whole track is baked once into a display list. Rumble strips and the center
+# line come from small repeating textures, and scrolling is a texture-matrix offset,
+# so the per-frame cost does not depend on how long the road is.
+TRACK_PATTERN_LENGTH = STRIP_LENGTH * 2  # red+white strip pair / one dash and gap
+_track_textures = {}
+
+def create_pattern_texture(texels):
+    # A 1 x N RGBA texture repeated along the road (t axis), sampled without filtering
+    data = bytes(c for texel in texels for c in texel)
+    tex_id = gen_texture(len(data), "track pattern")
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, len(texels), 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return tex_id
 
-    # 4. Headlights
-    glPushMatrix()
-    glColor3f(1.0, 1.0, 0.0)
-    glTranslatef(0.0, 0.0, 0.91)
-    glScalef(0.8, 0.1, 0.05)
-    draw_cube(1.0)
-    glPopMatrix()
+def textured_strip(x0, x1, y):
+    # Quad along the whole road; t counts pattern repeats from the far end
+    t1 = (TRACK_Z_NEAR - TRACK_Z_FAR) / TRACK_PATTERN_LENGTH
+    glBegin(GL_QUADS)
+    glTexCoord2f(0.5, 0.0); glVertex3f(x0, y, TRACK_Z_FAR)
+    glTexCoord2f(0.5, 0.0); glVertex3f(x1, y, TRACK_Z_FAR)
+    glTexCoord2f(0.5, t1); glVertex3f(x1, y, TRACK_Z_NEAR)
+    glTexCoord2f(0.5, t1); glVertex3f(x0, y, TRACK_Z_NEAR)
+    glEnd()
 
+def draw_track_geometry(markings=True):
+    y = GROUND_Y
+    half = ROAD_WIDTH / 2
+
+    # 1. Grass
+    glColor3f(0.1, 0.5, 0.1)
+    glBegin(GL_QUADS)
+    glVertex3f(-GRASS_HALF_WIDTH, y, TRACK_Z_FAR); glVertex3f(-half, y, TRACK_Z_FAR)
+    glVertex3f(-half, y, TRACK_Z_NEAR); glVertex3f(-GRASS_HALF_WIDTH, y, TRACK_Z_NEAR)
+    glVertex3f(half, y, TRACK_Z_FAR); glVertex3f(GRASS_HALF_WIDTH, y, TRACK_Z_FAR)
+    glVertex3f(GRASS_HALF_WIDTH, y, TRACK_Z_NEAR); glVertex3f(half, y, TRACK_Z_NEAR)
+    glEnd()
+
+    # 2. Road
+    glColor3f(0.2, 0.2, 0.2)
+    glBegin(GL_QUADS)
+    glVertex3f(-half, y, TRACK_Z_FAR); glVertex3f(half, y, TRACK_Z_FAR)
+    glVertex3f(half, y, TRACK_Z_NEAR); glVertex3f(-half, y, TRACK_Z_NEAR)
+    glEnd()
+
+    if not markings:
+        return
+    glEnable(GL_TEXTURE_2D)
+    glColor3f(1.0, 1.0, 1.0)
+
+    # 3. Rumble strips (red/white, one texel per strip)
+    glBindTexture(GL_TEXTURE_2D, _track_textures["strips"])
+    textured_strip(-half - 1.0, -half, y + 0.02)
+    textured_strip(half, half + 1.0, y + 0.02)
+
+    # 4. Center line (one texel per metre, dash from 1 to 3, transparent elsewhere)
+    glEnable(GL_ALPHA_TEST)
+    glAlphaFunc(GL_GREATER, 0.5)
+    glBindTexture(GL_TEXTURE_2D, _track_textures["center_line"])
+    textured_strip(-0.2, 0.2, y + 0.02)
+    glDisable(GL_ALPHA_TEST)
+
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glDisable(GL_TEXTURE_2D)
+
+def build_track_meshes(markings=True):
+    # markings=False leaves out the textured rumble strips and center line
+    delete_track_meshes()
+    red, white = (230, 25, 25, 255), (255, 255, 255, 255)
+    _track_textures["strips"] = create_pattern_texture([red, white])
+    dash, gap = (255, 204, 0, 255), (0, 0, 0, 0)
+    _track_textures["center_line"] = create_pattern_texture(
+        [dash if 1 <= i < 3 else gap for i in range(int(TRACK_PATTERN_LENGTH))])
+    compile_mesh("track", lambda: draw_track_geometry(markings))
+
+def delete_track_meshes():
+    delete_mesh("track")
+    if _track_textures:
+        delete_textures(_track_textures.values())
+        _track_textures.clear()
 
-# ---------- Racing Track ----------
 def draw_racing_track(track_offset):
+    if IMMEDIATE_MODE or not has_mesh("track"):
+        draw_racing_track_immediate(track_offset)
+        return
+
+    glDisable(GL_LIGHTING) # Disable lighting so ground colors pop
+    # Scroll the strip textures towards the camera; wrapping on the full pattern
+    # keeps the red/white order continuous
+    glMatrixMode(GL_TEXTURE)
+    glLoadIdentity()
+    glTranslatef(0.0, -(track_offset % TRACK_PATTERN_LENGTH) / TRACK_PATTERN_LENGTH, 0.0)
+    glMatrixMode(GL_MODELVIEW)
+    call_mesh("track")
+    glMatrixMode(GL_TEXTURE)
+    glLoadIdentity()
+    glMatrixMode(GL_MODELVIEW)
+    glEnable(GL_LIGHTING)
+
+def draw_racing_track_immediate(track_offset):
     y = GROUND_Y
     
     glDisable(GL_LIGHTING) # Disable lighting so ground colors pop
@@ -184,7 +569,65 @@ def draw_racing_track(track_offset):
 
     glEnable(GL_LIGHTING)
 
+# ---------- Sky ----------
+# Sky objects are tessellated once into cached meshes. "sphere" is a real GLU
+# sphere; "billboard" is a flat camera-facing disc whose normals follow a sphere,
+# so it is lit like one for a fraction of the vertices (for software GL).
+SUN_MODE = 'sphere'   # 'sphere' or 'billboard'
+SUN_SLICES = 20
+SUN_STACKS = 20
+
+# name -> position, radius, color
+SKY_OBJECTS = {
+    "sun": ((15.0, 15.0, -80.0), 8.0, (1.0, 0.9, 0.0)),
+}
+
+def draw_lit_disc(radius, slices, rings):
+    # Rings go from the rim (normal in the disc plane) to the center (normal facing the camera)
+    for ring in range(rings):
+        theta0 = (math.pi / 2) * (1.0 - ring / rings)
+        theta1 = (math.pi / 2) * (1.0 - (ring + 1) / rings)
+        glBegin(GL_QUAD_STRIP)
+        for i in range(slices + 1):
+            phi = 2.0 * math.pi * i / slices
+            cp, sp = math.cos(phi), math.sin(phi)
+            for theta in (theta0, theta1):
+                st, ct = math.sin(theta), math.cos(theta)
+                glNormal3f(st * cp, st * sp, ct)
+                glVertex3f(radius * st * cp, radius * st * sp, 0.0)
+        glEnd()
+
+def draw_sky_object(name, mode, slices, stacks):
+    position, radius, color = SKY_OBJECTS[name]
+    glPushMatrix()
+    glTranslatef(*position)
+    glColor3f(*color)
+    if mode == 'billboard':
+        draw_lit_disc(radius, slices, max(2, stacks // 5))
+    else:
+        quadric = new_quadric("sky:" + name)
+        gluSphere(quadric, radius, slices, stacks)
+        delete_quadric(quadric)
+    glPopMatrix()
+
+def build_sky_meshes(mode=None, slices=None, stacks=None):
+    # Can be called again at runtime to change the tessellation level
+    mode = mode or SUN_MODE
+    slices = slices or SUN_SLICES
+    stacks = stacks or SUN_STACKS
+    for name in SKY_OBJECTS:
+        compile_mesh("sky:" + name, lambda name=name: draw_sky_object(name, mode, slices, stacks))
+
 def draw_3d_sun():
+    # Lighting stays enabled so the sky objects look 3D
+    if IMMEDIATE_MODE:
+        draw_3d_sun_immediate()
+        return
+    for name in SKY_OBJECTS:
+        if has_mesh("sky:" + name):
+            call_mesh("sky:" + name)
+
+def draw_3d_sun_immediate():
     # We keep lighting ENABLED here so the sphere reacts to light and looks 3D
     # Or we can disable it and use just color.
     # To make it look like a 3D ball, we use gluSphere.
@@ -196,21 +639,162 @@ def draw_3d_sun():
     glColor3f(1.0, 0.9, 0.0) 
     
     # Create a Quadric object for the sphere
-    quadric = gluNewQuadric()
+    quadric = new_quadric("sun")
     
     # ### --- NEW: Draw a 3D Sphere instead of a flat disk ---
     # Radius 8.0, 20 slices, 20 stacks
     gluSphere(quadric, 8.0, 20, 20)
     
-    gluDeleteQuadric(quadric)
+    delete_quadric(quadric)
+    glPopMatrix()
+
+# ---------- Scene ----------
+def draw_obstacles(renderer, obstacles, z_shift=0.0):
+    # z_shift moves every obstacle along the road (render interpolation)
+    if z_shift:
+        glPushMatrix()
+        glTranslatef(0.0, 0.0, z_shift)
+    if IMMEDIATE_MODE:
+        for (x, y, z), color in zip(obstacles.positions, obstacles.colors):
+            glPushMatrix()
+            glTranslatef(x, y, z)
+            glScalef(CAR_SCALE, CAR_SCALE, CAR_SCALE) # Make car slightly bigger than box
+            draw_car(color)
+            glPopMatrix()
+    else:
+        renderer.draw(obstacles.positions, obstacles.colors)
+    if z_shift:
+        glPopMatrix()
+
+def draw_player(sim, x=None):
+    glPushMatrix()
+    glTranslatef(sim.player_x if x is None else x, PLAYER_Y, PLAYER_Z)
+    glScalef(CAR_SCALE, CAR_SCALE, CAR_SCALE)
+
+    # ### --- NEW: Color Flash Logic ---
+    player_color = (0.1, 0.6, 0.9) # Normal Blue
+    if sim.hit_flash_timer > 0:
+        # Toggle color every 0.1 seconds
+        if int(sim.hit_flash_timer * 10) % 2 == 0:
+            player_color = (1.0, 0.0, 0.0) # Flash Red
+
+    draw_car(player_color)
     glPopMatrix()
 
+# ---------- Quality tiers ----------
+# Best first. sun: (SUN_MODE, slices, stacks); lod_scale scales the CAR_LODS
+# switch distances; draw_distance is where obstacle cars stop being drawn (they
+# spawn ~78 away); far_plane keeps the sun (~106 deep) and the road end (118);
+# resolution_scale draws the 3D scene at that fraction of the window size
+# (not on software GL, see SceneTarget).
+# The rumble strips are a single repeating texture, so their density costs
+# nothing; the lowest tier leaves the road markings out instead.
+QUALITY_TIERS = [
+    {"name": "high", "sun": ("sphere", 20, 20), "track_markings": True, "lod_scale": 1.0,
+     "draw_distance": FAR_PLANE, "far_plane": FAR_PLANE, "resolution_scale": 1.0},
+    {"name": "medium", "sun": ("sphere", 12, 10), "track_markings": True, "lod_scale": 0.75,
+     "draw_distance": FAR_PLANE, "far_plane": 160.0, "resolution_scale": 1.0},
+    {"name": "low", "sun": ("billboard", 16, 10), "track_markings": True, "lod_scale": 0.5,
+     "draw_distance": 72.0, "far_plane": 130.0, "resolution_scale": 0.75},
+    {"name": "lowest", "sun": ("billboard", 10, 5), "track_markings": False, "lod_scale": 0.0,
+     "draw_distance": 62.0, "far_plane": 120.0, "resolution_scale": 0.5},
+]
+
+SOFTWARE_RENDERERS = ("llvmpipe", "softpipe", "swrast", "software")
+
+def software_gl():
+    renderer = (glGetString(GL_RENDERER) or b"").decode("ascii", "replace").lower()
+    return any(name in renderer for name in SOFTWARE_RENDERERS)
+
+class SceneTarget:
+    # Where the 3D scene is drawn. At scale 1 that is the window itself; below
+    # it, a framebuffer object of that fraction of the window size which end()
+    # stretches onto whatever was bound before begin() (the window, or
+    # video.py's capture framebuffer), so the HUD drawn afterwards stays sharp.
+    # Software rasterizers always draw at full size: there the stretch alone
+    # costs about as much as the whole scene (20 ms vs 19 ms at 1800x1200 on llvmpipe).
+    def __init__(self):
+        self.scale = 1.0
+        self.fbo = None
+        self.renderbuffers = []
+        self.size = (WIN_W, WIN_H)
+        self.scalable = not software_gl()
+        self.previous = None  # (framebuffer, viewport) bound before begin()
+
+    def set_scale(self, scale):
+        if scale == self.scale or not self.scalable:
+            return
+        self.delete()
+        if scale >= 1.0:
+            return
+        if not (bool(glGenFramebuffers) and bool(glBlitFramebuffer)):
+            print("Framebuffer objects unavailable, drawing at full resolution")
+            return
+        w, h = max(1, int(WIN_W * scale)), max(1, int(WIN_H * scale))
+        fbo = gen_framebuffer("scaled scene")
+        color_rb = gen_renderbuffer(w * h * 4, "scaled scene color")
+        depth_rb = gen_renderbuffer(w * h * 4, "scaled scene depth")
+        glBindRenderbuffer(GL_RENDERBUFFER, color_rb)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, w, h)
+        glBindRenderbuffer(GL_RENDERBUFFER, depth_rb)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, w, h)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        previous = int(glGetIntegerv(GL_FRAMEBUFFER_BINDING))
+        glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color_rb)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, depth_rb)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, previous)
+        self.fbo, self.renderbuffers = fbo, [color_rb, depth_rb]
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            print(f"Scaled framebuffer incomplete (0x{int(status):x}), drawing at full resolution")
+            self.delete()
+            return
+        self.scale, self.size = scale, (w, h)
+
+    def begin(self):
+        if self.fbo is not None:
+            self.previous = (int(glGetIntegerv(GL_FRAMEBUFFER_BINDING)),
+                             [int(v) for v in glGetIntegerv(GL_VIEWPORT)])
+            glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+            glViewport(0, 0, *self.size)
+
+    def end(self):
+        if self.fbo is not None and self.previous is not None:
+            w, h = self.size
+            target, (x, y, vw, vh) = self.previous
+            glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, target)
+            glBlitFramebuffer(0, 0, w, h, x, y, x + vw, y + vh, GL_COLOR_BUFFER_BIT, GL_LINEAR)
+            glBindFramebuffer(GL_FRAMEBUFFER, target)
+            glViewport(x, y, vw, vh)
+            self.previous = None
+
+    def delete(self):
+        if self.fbo is not None:
+            delete_renderbuffers(self.renderbuffers)
+            delete_framebuffer(self.fbo)
+        self.fbo = None
+        self.renderbuffers = []
+        self.scale, self.size = 1.0, (WIN_W, WIN_H)
+
+def apply_quality(tier, obstacle_renderer, scene_target):
+    mode, slices, stacks = tier["sun"]
+    build_sky_meshes(mode, slices, stacks)
+    build_track_meshes(tier["track_markings"])
+    obstacle_renderer.set_detail(tier["lod_scale"], tier["draw_distance"])
+    set_perspective(tier["far_plane"])
+    scene_target.set_scale(tier["resolution_scale"])
+
 # ---------- HUD text ----------
+TEXT_CACHE_SIZE = 64        # whole-string textures kept alive (LRU)
+GLYPH_ATLAS_SIZE = 512      # one square atlas texture per font
+
 def create_text_texture(font, text, color=(255,255,255)):
     surface = font.render(text, True, color)
     data = pg.image.tostring(surface, "RGBA", True)
     w, h = surface.get_size()
-    tex_id = glGenTextures(1)
+    tex_id = gen_texture(len(data), "text")
     glBindTexture(GL_TEXTURE_2D, tex_id)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
@@ -220,11 +804,9 @@ def create_text_texture(font, text, color=(255,255,255)):
     return tex_id, w, h
 
 
-def draw_text_ortho(tex_id, w, h, x, y):
+def begin_ortho():
     glDisable(GL_LIGHTING)
     glEnable(GL_TEXTURE_2D)
-    glBindTexture(GL_TEXTURE_2D, tex_id)
-    glColor3f(1,1,1)
 
     glMatrixMode(GL_PROJECTION)
     glPushMatrix(); glLoadIdentity()
@@ -233,6 +815,20 @@ def draw_text_ortho(tex_id, w, h, x, y):
     glMatrixMode(GL_MODELVIEW)
     glPushMatrix(); glLoadIdentity()
 
+def end_ortho():
+    glPopMatrix()
+    glMatrixMode(GL_PROJECTION); glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glDisable(GL_TEXTURE_2D)
+
+
+def draw_text_ortho(tex_id, w, h, x, y):
+    begin_ortho()
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+    glColor3f(1,1,1)
+
     glBegin(GL_QUADS)
     glTexCoord2f(0,1); glVertex2f(x, WIN_H - y)
     glTexCoord2f(1,1); glVertex2f(x + w, WIN_H - y)
@@ -240,141 +836,726 @@ def draw_text_ortho(tex_id, w, h, x, y):
     glTexCoord2f(0,0); glVertex2f(x, WIN_H - (y + h))
     glEnd()
 
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION); glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
+    end_ortho()
+
+
+class GlyphAtlas:
+    # White glyphs of one font packed into a single texture, tinted with glColor
+    # at draw time. Strings that change every frame (score, typed name) are drawn
+    # from here, so only never-seen characters cause an upload.
+    def __init__(self, font, size=GLYPH_ATLAS_SIZE):
+        self.font = font
+        self.size = size
+        self.line_height = font.get_linesize()
+        self.glyphs = {}  # char -> (u0, v0, u1, v1, w, h)
+        self.hits = 0
+        self.misses = 0
+        self.resets = 0
+        self.tex_id = gen_texture(size * size * 4, "glyph atlas")
+        glBindTexture(GL_TEXTURE_2D, self.tex_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, size, size, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self._reset_packing()
+
+    def _reset_packing(self):
+        self.resets += 1
+        self.glyphs.clear()
+        self.pen_x = 0
+        self.pen_y = 0
+        self.row_h = 0
+
+    def _add_glyph(self, ch):
+        surface = self.font.render(ch, True, (255,255,255))
+        w, h = surface.get_size()
+        if self.pen_x + w > self.size:
+            self.pen_x = 0
+            self.pen_y += self.row_h + 1
+            self.row_h = 0
+        if self.pen_y + h > self.size:
+            # Atlas full: start over, glyphs in use get re-added on demand
+            self._reset_packing()
+        data = pg.image.tostring(surface, "RGBA", True)
+        glBindTexture(GL_TEXTURE_2D, self.tex_id)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, self.pen_x, self.pen_y, w, h, GL_RGBA, GL_UNSIGNED_BYTE, data)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        s = float(self.size)
+        glyph = (self.pen_x / s, self.pen_y / s, (self.pen_x + w) / s, (self.pen_y + h) / s, w, h)
+        self.glyphs[ch] = glyph
+        self.pen_x += w + 1
+        self.row_h = max(self.row_h, h)
+        return glyph
+
+    def glyph(self, ch):
+        glyph = self.glyphs.get(ch)
+        if glyph is None:
+            self.misses += 1
+            return self._add_glyph(ch)
+        self.hits += 1
+        return glyph
+
+    def text_size(self, text):
+        w = 0
+        h = self.line_height
+        for ch in text:
+            glyph = self.glyph(ch)
+            w += glyph[4]
+            h = max(h, glyph[5])
+        return w, h
+
+    def draw(self, text, color, x, y):
+        # Resolve glyphs first: uploads must not happen inside glBegin/glEnd.
+        # If the atlas filled up and started over partway through, the glyphs
+        # looked up before that are being overwritten: look them all up again.
+        resets = self.resets
+        glyphs = [self.glyph(ch) for ch in text]
+        if self.resets != resets:
+            glyphs = [self.glyph(ch) for ch in text]
+        begin_ortho()
+        glBindTexture(GL_TEXTURE_2D, self.tex_id)
+        glColor3f(color[0] / 255.0, color[1] / 255.0, color[2] / 255.0)
+        glBegin(GL_QUADS)
+        for u0, v0, u1, v1, w, h in glyphs:
+            glTexCoord2f(u0, v1); glVertex2f(x, WIN_H - y)
+            glTexCoord2f(u1, v1); glVertex2f(x + w, WIN_H - y)
+            glTexCoord2f(u1, v0); glVertex2f(x + w, WIN_H - (y + h))
+            glTexCoord2f(u0, v0); glVertex2f(x, WIN_H - (y + h))
+            x += w
+        glEnd()
+        end_ortho()
+
+    def delete(self):
+        delete_textures([self.tex_id])
+
+
+class TextCache:
+    # Keeps rendered string textures keyed by (font, text, color) with LRU eviction,
+    # plus one glyph atlas per font for frequently changing strings.
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.textures = OrderedDict()  # (font, text, color) -> (tex_id, w, h)
+        self.atlases = {}              # font -> GlyphAtlas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, font, text, color=(255,255,255)):
+        key = (font, text, tuple(color))
+        entry = self.textures.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = create_text_texture(font, text, color)
+        self.textures[key] = entry
+        if len(self.textures) > self.max_entries:
+            _, (old_tex, _, _) = self.textures.popitem(last=False)
+            delete_textures([old_tex])
+            self.evictions += 1
+        return entry
+
+    def glyphs(self, font):
+        atlas = self.atlases.get(font)
+        if atlas is None:
+            atlas = self.atlases[font] = GlyphAtlas(font)
+        return atlas
+
+    def stats(self):
+        return {
+            "entries": len(self.textures),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "glyph_hits": sum(a.hits for a in self.atlases.values()),
+            "glyph_misses": sum(a.misses for a in self.atlases.values()),
+        }
+
+    def clear(self):
+        if self.textures:
+            delete_textures([tex for tex, _, _ in self.textures.values()])
+            self.textures.clear()
+        for atlas in self.atlases.values():
+            atlas.delete()
+        self.atlases.clear()
+
+# ---------- Menus & HUD ----------
+MENU_OPTIONS = ["Play", "Leaderboard", "Watch Replay"]
+
+def begin_hud():
+    glDisable(GL_DEPTH_TEST)
+    glDepthMask(GL_FALSE)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-    glBindTexture(GL_TEXTURE_2D, 0)
+def end_hud():
+    # restore 3D state
+    glDepthMask(GL_TRUE)
+    glEnable(GL_DEPTH_TEST)
+
+# Hud fonts by name: (font file or None for pygame's default, size)
+HUD_FONTS = {
+    "title_font": (None, 72),
+    "menu_font": (None, 40),
+    "hud_font": (None, 28),
+    "big_font": (None, 56),
+    "input_font": (None, 36),
+}
+LOADING_BAR_SIZE = (360, 16)
+
+CURSOR_BLINK_PERIOD = 1.0   # seconds
+CURSOR_ON = 0.6             # seconds of each period the cursor is shown
+
+def cursor_visible():
+    # Blink phase of the text cursor on the name screen
+    return (time.time() % CURSOR_BLINK_PERIOD) < CURSOR_ON
+
+def cursor_next_change():
+    # Seconds until the cursor next appears or disappears
+    phase = time.time() % CURSOR_BLINK_PERIOD
+    return (CURSOR_ON if phase < CURSOR_ON else CURSOR_BLINK_PERIOD) - phase
+
+def draw_loading_screen(progress):
+    # Progress bar only: no text, since the fonts may still be loading
+    bw, bh = LOADING_BAR_SIZE
+    x0, y0 = WIN_W / 2 - bw / 2, WIN_H / 2 - bh / 2
+    begin_ortho()
     glDisable(GL_TEXTURE_2D)
+    glBegin(GL_QUADS)
+    glColor4f(0.0, 0.0, 0.0, 0.6)
+    glVertex2f(x0 - 3, y0 - 3); glVertex2f(x0 + bw + 3, y0 - 3)
+    glVertex2f(x0 + bw + 3, y0 + bh + 3); glVertex2f(x0 - 3, y0 + bh + 3)
+    glColor4f(1.0, 0.86, 0.16, 1.0)
+    glVertex2f(x0, y0); glVertex2f(x0 + bw * progress, y0)
+    glVertex2f(x0 + bw * progress, y0 + bh); glVertex2f(x0, y0 + bh)
+    glEnd()
+    end_ortho()
+
+class Hud:
+    # Fonts plus the 2D screen for every game state, drawn between begin_hud()
+    # and end_hud(). fonts maps HUD_FONTS names to loaded fonts; missing ones
+    # are loaded here. hints=False leaves out the key prompts ("Press R to
+    # Restart ..."), for video.py's recordings where nobody can press anything.
+    def __init__(self, text_cache, fonts=None, hints=True):
+        self.text_cache = text_cache
+        self.hints = hints
+        fonts = dict(fonts or {})
+        for name, (path, size) in HUD_FONTS.items():
+            if fonts.get(name) is None:
+                fonts[name] = pg.font.Font(path, size)
+        self.title_font = fonts["title_font"]
+        self.menu_font = fonts["menu_font"]
+        self.hud_font = fonts["hud_font"]
+        self.big_font = fonts["big_font"]
+        self.input_font = fonts["input_font"]
+
+    def content_key(self, state, sim, menu_index=0, difficulty_index=1, player_name="", paused=False,
+                    leaderboard_view=None, replay=None):
+        # Everything draw() shows for these arguments: equal keys draw identical screens
+        if state == 'menu':
+            return state, menu_index
+        if state == 'enter_name':
+            return state, player_name, cursor_visible()
+        if state == 'difficulty':
+            return state, difficulty_index
+        if state == 'leaderboard':
+            return state, leaderboard_view.scope_index, leaderboard_view.rows()
+        if state in ('playing', 'replay'):
+            if state == 'replay':
+                return state, sim.score, sim.lives, paused, replay.replay.path, replay.finished or sim.game_over
+            return state, sim.score, sim.lives, paused
+        if state == 'game_over':
+            return state, sim.score
+        return (state,)
+
+    def draw(self, state, sim, menu_index=0, difficulty_index=1, player_name="", paused=False,
+             leaderboard_view=None, replay=None):
+        text_cache = self.text_cache
+        title_font, menu_font, hud_font = self.title_font, self.menu_font, self.hud_font
+        big_font, input_font = self.big_font, self.input_font
+
+        # MENU
+        if state == 'menu':
+            title_tex, tw, th = text_cache.get(title_font, "CAR DODGE 3D", (255,255,255))
+            draw_text_ortho(title_tex, tw, th, WIN_W//2 - tw//2, WIN_H//2 - 120)
+
+            for i, opt in enumerate(MENU_OPTIONS):
+                color = (255, 220, 40) if i == menu_index else (255,255,255)
+                tex, w, h = text_cache.get(menu_font, opt, color)
+                draw_text_ortho(tex, w, h, WIN_W//2 - w//2, WIN_H//2 - 30 + i*50)
+
+            if self.hints:
+                hint_tex, hw, hh = text_cache.get(hud_font, "Use Up/Down and Enter. Esc to Quit.", (200,200,200))
+                draw_text_ortho(hint_tex, hw, hh, WIN_W//2 - hw//2, WIN_H - 60)
+
+        # ENTER NAME (Option A)
+        elif state == 'enter_name':
+            msg_tex, mw, mh = text_cache.get(title_font, "ENTER YOUR NAME", (255,255,255))
+            draw_text_ortho(msg_tex, mw, mh, WIN_W//2 - mw//2, WIN_H//2 - 120)
+
+            # show current typed name with cursor
+            display_name = player_name + ("_" if cursor_visible() else "")
+            name_glyphs = text_cache.glyphs(input_font)
+            nw, nh = name_glyphs.text_size(display_name)
+            name_glyphs.draw(display_name, (255, 220, 40), WIN_W//2 - nw//2, WIN_H//2 - 20)
+
+            if self.hints:
+                hint_tex, hw, hh = text_cache.get(hud_font, "Type name (max 12 chars). Press Enter to continue.", (200,200,200))
+                draw_text_ortho(hint_tex, hw, hh, WIN_W//2 - hw//2, WIN_H - 60)
+
+        # DIFFICULTY
+        elif state == 'difficulty':
+            title_tex, tw, th = text_cache.get(title_font, "Select Difficulty", (255,255,255))
+            draw_text_ortho(title_tex, tw, th, WIN_W//2 - tw//2, WIN_H//2 - 130)
+
+            for i, d in enumerate(DIFFICULTIES):
+                color = (255,220,40) if i == difficulty_index else (255,255,255)
+                tex, w, h = text_cache.get(menu_font, d, color)
+                draw_text_ortho(tex, w, h, WIN_W//2 - w//2, WIN_H//2 - 20 + i*50)
+
+            if self.hints:
+                info_tex, iw, ih = text_cache.get(hud_font, "Esc to go back", (200,200,200))
+                draw_text_ortho(info_tex, iw, ih, WIN_W//2 - iw//2, WIN_H - 60)
+
+        # LEADERBOARD
+        elif state == 'leaderboard':
+            title_tex, tw, th = text_cache.get(title_font, "LEADERBOARD", (255,255,255))
+            draw_text_ortho(title_tex, tw, th, WIN_W//2 - tw//2, 40)
+
+            scope = leaderboard_view.scope or "All difficulties"
+            scope_tex, cw, ch = text_cache.get(menu_font, f"< Top {leaderboard_view.n}: {scope} >", (255,220,40))
+            draw_text_ortho(scope_tex, cw, ch, WIN_W//2 - cw//2, 100)
 
-# ---------- Game objects ----------
-class Obstacle:
-    def __init__(self, x, y, z, size, color):
-        self.x, self.y, self.z = x, y, z
-        self.size, self.color = size, color
-
-    def update(self, dz):
-        self.z += dz
-   
-
-# ---------- Collision ----------
-def check_collision(player_x, obstacle):
-    dx = abs(player_x - obstacle.x)
-    dz = abs(PLAYER_Z - obstacle.z)
-    collide_x = dx <= (PLAYER_HALF_WIDTH + obstacle.size / 2.0)
-    collide_z = dz <= (PLAYER_HALF_DEPTH + obstacle.size / 2.0)
-    return collide_x and collide_z
-
-# ---------- Leaderboard helpers ----------
-def append_score_to_leaderboard(name, score):
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    safe_name = name.strip() if name and name.strip() else "Player"
-    line = f"{ts} | {safe_name} | {score}\n"
-    try:
-        with open(LEADERBOARD_PATH, "a", encoding="utf-8") as f:
-            f.write(line)
-        print("Score saved:", line.strip())
-    except Exception as e:
-        print("Failed to write leaderboard:", e)
-
-def read_leaderboard_lines():
-    try:
-        with open(LEADERBOARD_PATH, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        lines = []
-    return [l.strip() for l in lines if l.strip()]
+            rows = leaderboard_view.rows()
+            if not rows:
+                empty_tex, ew, eh = text_cache.get(menu_font, "No scores yet", (200,200,200))
+                draw_text_ortho(empty_tex, ew, eh, WIN_W//2 - ew//2, WIN_H//2 - 20)
+            else:
+                start_y = 150
+                for i, (ts, name, row_score, row_difficulty) in enumerate(rows):
+                    ln = f"{i+1}. {row_score}  {name}  ({row_difficulty or '-'})  {ts}"
+                    tex, w, h = text_cache.get(hud_font, ln, (230,230,230))
+                    draw_text_ortho(tex, w, h, 60, start_y + i*30)
+
+            if self.hints:
+                hint_tex, hw, hh = text_cache.get(hud_font, "Left/Right to change list. Esc or Enter to return to menu", (200,200,200))
+                draw_text_ortho(hint_tex, hw, hh, WIN_W//2 - hw//2, WIN_H - 60)
+
+        # PLAYING HUD (also while watching a replay)
+        elif state in ('playing', 'replay'):
+            hud_glyphs = text_cache.glyphs(hud_font)
+            lives_text = f"Lives: {sim.lives}"
+            lw, lh = hud_glyphs.text_size(lives_text)
+            hud_glyphs.draw(f"Score: {sim.score}", (255,255,255), 12, 12)
+            hud_glyphs.draw(lives_text, (255,200,80), WIN_W - (lw + 12), 12)
+
+            if state == 'replay':
+                header = replay.replay.header
+                label = f"REPLAY: {header.get('name') or 'Player'} ({header.get('difficulty') or '-'})"
+                rw, rh = hud_glyphs.text_size(label)
+                hud_glyphs.draw(label, (255,220,40), WIN_W//2 - rw//2, 12)
+                if replay.finished or sim.game_over:
+                    etex, ew, eh = text_cache.get(big_font, "REPLAY OVER", (255,220,40))
+                    draw_text_ortho(etex, ew, eh, WIN_W//2 - ew//2, WIN_H//2 - 90)
+                    if self.hints:
+                        htex, hw, hh = text_cache.get(menu_font, "Press Enter or Esc for Menu", (255,255,255))
+                        draw_text_ortho(htex, hw, hh, WIN_W//2 - hw//2, WIN_H//2 - 20)
+
+            if paused:
+                ptex, pw, ph = text_cache.get(big_font, "PAUSED", (255,255,255))
+                draw_text_ortho(ptex, pw, ph, WIN_W//2 - pw//2, WIN_H//2 - ph//2)
+
+        # GAME OVER
+        elif state == 'game_over':
+            hud_glyphs = text_cache.glyphs(hud_font)
+            final_text = f"Final Score: {sim.score}"
+            sw, sh = hud_glyphs.text_size(final_text)
+            hud_glyphs.draw(final_text, (255,255,255), WIN_W//2 - sw//2, WIN_H//2 + 40)
+
+            msg1_tex, mw1, mh1 = text_cache.get(big_font, "GAME OVER", (255,40,40))
+            draw_text_ortho(msg1_tex, mw1, mh1, WIN_W//2 - mw1//2, WIN_H//2 - 90)
+            if self.hints:
+                msg2_tex, mw2, mh2 = text_cache.get(menu_font, "Press R to Restart or Esc to Menu", (255,255,255))
+                draw_text_ortho(msg2_tex, mw2, mh2, WIN_W//2 - mw2//2, WIN_H//2 - 20)
+
+HUD_LAYER_GAP = 32  # empty pixels that split the layer's text into separate rectangles
+
+def content_rects(mask, gap=HUD_LAYER_GAP):
+    # (x0, y0, x1, y1) rectangles covering every set pixel of a 2D mask: one
+    # per run of rows with content, split where a run has wide empty columns
+    rects = []
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not len(rows):
+        return rects
+    breaks = np.flatnonzero(np.diff(rows) > 1)
+    for y0, y1 in zip(np.r_[rows[0], rows[breaks + 1]], np.r_[rows[breaks], rows[-1]] + 1):
+        cols = np.flatnonzero(mask[y0:y1].any(axis=0))
+        splits = np.flatnonzero(np.diff(cols) > gap)
+        for x0, x1 in zip(np.r_[cols[0], cols[splits + 1]], np.r_[cols[splits], cols[-1]] + 1):
+            rects.append((int(x0), int(y0), int(x1), int(y1)))
+    return rects
+
+class HudLayer:
+    # The Hud rendered into a window-sized texture through a framebuffer object.
+    # The texture is redrawn only when Hud.content_key() changes (score, lives,
+    # pause, menu selection, ...). Every other frame the HUD costs one batch of
+    # textured quads covering just the pixels that have text, which keeps the
+    # blending cheap on fill-rate-bound (software) renderers.
+    # Without framebuffer objects the Hud is drawn directly every frame.
+    def __init__(self, hud):
+        self.hud = hud
+        self.fbo = None
+        self.tex_id = None
+        self.key = None
+        self.rects = []
+        self.redraws = 0
+        if HUD_LAYER:
+            self._init_layer()
+
+    def _init_layer(self):
+        if not bool(glGenFramebuffers):
+            return
+        tex_id = gen_texture(WIN_W * WIN_H * 4, "hud layer")
+        glBindTexture(GL_TEXTURE_2D, tex_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, WIN_W, WIN_H, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        previous = int(glGetIntegerv(GL_FRAMEBUFFER_BINDING))
+        fbo = gen_framebuffer("hud layer")
+        glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, tex_id, 0)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, previous)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            print(f"HUD layer unavailable (framebuffer status 0x{int(status):x}), drawing the HUD directly")
+            delete_framebuffer(fbo)
+            delete_textures([tex_id])
+            return
+        self.fbo, self.tex_id = fbo, tex_id
+
+    @property
+    def cached(self):
+        return self.fbo is not None
+
+    def draw(self, state, sim, **screen):
+        # Same arguments as Hud.draw(), also between begin_hud() and end_hud()
+        if self.fbo is None:
+            self.hud.draw(state, sim, **screen)
+            return
+        key = self.hud.content_key(state, sim, **screen)
+        if key != self.key:
+            self._redraw(state, sim, screen)
+            self.key = key
+        if not self.rects:
+            return
+        sx, sy = 1.0 / WIN_W, 1.0 / WIN_H
+        begin_ortho()
+        glBindTexture(GL_TEXTURE_2D, self.tex_id)
+        glColor4f(1.0, 1.0, 1.0, 1.0)
+        glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)  # the layer holds premultiplied color
+        glBegin(GL_QUADS)
+        for x0, y0, x1, y1 in self.rects:
+            glTexCoord2f(x0 * sx, y0 * sy); glVertex2f(x0, y0)
+            glTexCoord2f(x1 * sx, y0 * sy); glVertex2f(x1, y0)
+            glTexCoord2f(x1 * sx, y1 * sy); glVertex2f(x1, y1)
+            glTexCoord2f(x0 * sx, y1 * sy); glVertex2f(x0, y1)
+        glEnd()
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        end_ortho()
+
+    def _redraw(self, state, sim, screen):
+        # Keeps whatever framebuffer is bound (the window, or video.py's) intact
+        previous = int(glGetIntegerv(GL_FRAMEBUFFER_BINDING))
+        glPushAttrib(GL_VIEWPORT_BIT | GL_COLOR_BUFFER_BIT)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, WIN_W, WIN_H)
+        glClearColor(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        # Color premultiplied by alpha, alpha accumulated, so that compositing
+        # the layer gives the same pixels as drawing the strings on the scene
+        glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        self.hud.draw(state, sim, **screen)
+        # Find where the text landed, so compositing skips the empty pixels
+        glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        alpha = glReadPixels(0, 0, WIN_W, WIN_H, GL_ALPHA, GL_UNSIGNED_BYTE)
+        glPopClientAttrib()
+        self.rects = content_rects(np.frombuffer(alpha, dtype=np.uint8).reshape(WIN_H, WIN_W) > 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, previous)
+        glPopAttrib()
+        self.redraws += 1
+
+    def delete(self):
+        if self.fbo is not None:
+            delete_framebuffer(self.fbo)
+            delete_textures([self.tex_id])
+            self.fbo = self.tex_id = None
+
+# ---------- Sound bank ----------
+# Short effects are decoded by the asset loader (see assets.py) and played on
+# a pool of mixer channels, so overlapping crash/coin sounds don't cut each
+# other off. Music is streamed from disk with pg.mixer.music instead of decoded up front.
+SFX_FILES = {
+    "crash": "car-crash-sound-376882.mp3",
+    "coin": "coin-recieved-230517.mp3",
+}
+GAME_OVER_MUSIC = "AudioCutter_Hades II - Time Cannot Be Stopped.ogg"
+DIFFICULTY_MUSIC = ["Hotel.ogg", "Godspeed - Grace CST.ogg", "Death By Glamour.ogg",  # Easy, Normal, Hard
+                    "Final Strategy but its the part I like a lot.ogg"]               # Rush Hour
+SFX_VOICES = 8
+
+class SoundBank:
+    # sounds maps names to pg.mixer.Sound; names not loaded yet play nothing
+    def __init__(self, sounds, voices=SFX_VOICES):
+        pg.mixer.set_num_channels(voices)
+        self.sounds = sounds
+        self.voices = [pg.mixer.Channel(i) for i in range(voices)]
+        self.started = [0.0] * voices
+
+    def play(self, name):
+        # Use a free voice, otherwise steal the one that started longest ago
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        now = time.perf_counter()
+        free = [i for i, ch in enumerate(self.voices) if not ch.get_busy()]
+        i = free[0] if free else min(range(len(self.voices)), key=self.started.__getitem__)
+        self.voices[i].play(sound)
+        self.started[i] = now
+
+    def play_music(self, path, loops=-1):
+        pg.mixer.music.load(path)
+        pg.mixer.music.play(loops)
+
+    def pause_music(self):
+        pg.mixer.music.pause()
+
+    def unpause_music(self):
+        pg.mixer.music.unpause()
+
+# ---------- Profiler overlay ----------
+# Phases of one frame of main(), in order. F3 toggles the overlay, F4 exports
+# the recorded frames to CSV and Chrome trace JSON.
+PROFILER_PHASES = ["wait", "events", "update", "sun", "track", "obstacles", "player", "hud", "overlay", "flip"]
+PROFILER_OVERLAY_REFRESH = 0.5  # seconds between percentile updates
+
+def draw_profiler_overlay(atlas, stats, x=12, y=40, notes=()):
+    # notes: extra lines shown under the table
+    color = (170, 255, 170)
+    line_h = atlas.line_height
+    columns = [("phase", 0), ("p50", 110), ("p95", 170), ("p99", 230)]
+    for label, dx in columns:
+        atlas.draw(label, (255, 255, 255), x + dx, y)
+    for i, (name, values) in enumerate(stats.items()):
+        row_y = y + (i + 1) * line_h
+        atlas.draw(name, color, x, row_y)
+        for (_, dx), value in zip(columns[1:], values):
+            atlas.draw(f"{value:.2f}", color, x + dx, row_y)
+    for i, note in enumerate(notes):
+        atlas.draw(note, (255, 255, 255), x, y + (len(stats) + 2 + i) * line_h)
+
+def export_profile(profiler, governor=None):
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    csv_path, trace_path = f"profile_{stamp}.csv", f"profile_{stamp}.json"
+    profiler.export_csv(csv_path)
+    profiler.export_chrome_trace(trace_path)
+    print("Profile saved:", csv_path, trace_path)
+    if governor is not None:
+        quality_path = f"profile_{stamp}_quality.csv"
+        governor.export_csv(quality_path)
+        print("Quality tier changes saved:", quality_path)
 
 # ---------- Main game ----------
+# Assets each state needs first; the loader moves them to the front of its queue
+STATE_ASSETS = {'loading': list(HUD_FONTS), 'playing': list(SFX_FILES), 'replay': list(SFX_FILES)}
+
+# The game's states and how the frame loop runs them. Animated states draw
+# every frame at the frame rate cap. Static ones (and a paused game or an ended
+# replay) block in pg.event.wait() and draw only after input, a state change or
+# a change in what the HUD shows (Hud.content_key). "wake" returns how long a
+# static state may sleep at most, for screens that change by themselves; None
+# (or none given) sleeps until the next event.
+LEADERBOARD_POLL_INTERVAL = 1.0  # seconds between checks for newly saved scores
+STATES = {
+    'loading':     {"animated": True},
+    'menu':        {"animated": False, "wake": None},
+    'enter_name':  {"animated": False, "wake": cursor_next_change},
+    'difficulty':  {"animated": False, "wake": None},
+    'leaderboard': {"animated": False, "wake": lambda: LEADERBOARD_POLL_INTERVAL},
+    'playing':     {"animated": True},
+    'game_over':   {"animated": False, "wake": None},
+    'replay':      {"animated": True},
+}
+
+def wait_events(timeout=None):
+    # Blocks until there is an event or timeout seconds have passed (None: no
+    # limit) and returns the pending events, oldest first
+    if timeout is None:
+        event = pg.event.wait()
+    else:
+        event = pg.event.wait(max(1, math.ceil(timeout * 1000.0)))
+    if event.type == NOEVENT:
+        return []
+    return [event] + pg.event.get()
+
 def main():
+    startup = time.perf_counter()
     pg.init()
     pg.mixer.init()
     pg.font.init()
-    screen = pg.display.set_mode((WIN_W, WIN_H), DOUBLEBUF | OPENGL)
+
+    # Fonts and sound effects load on a worker thread while the window opens;
+    # the first frames show a loading screen until the menu's fonts are in
+    assets = AssetLoader()
+    for name, (path, size) in HUD_FONTS.items():
+        assets.add_font(name, path, size, URGENT)
+    for name, path in SFX_FILES.items():
+        assets.add_sound(name, path, NORMAL)
+    assets.start()
+
+    frame_rate_mode = FRAME_RATE_MODE
+    if frame_rate_mode == 'vsync':
+        try:
+            screen = pg.display.set_mode((WIN_W, WIN_H), DOUBLEBUF | OPENGL, vsync=1)
+        except pg.error as e:
+            print("VSync unavailable, capping the frame rate instead:", e)
+            frame_rate_mode = 'capped'
+    if frame_rate_mode != 'vsync':
+        screen = pg.display.set_mode((WIN_W, WIN_H), DOUBLEBUF | OPENGL)
     pg.display.set_caption("CAR DODGE 3D")
     clock = pg.time.Clock()
 
-    # Fonts
-    title_font = pg.font.Font(None, 72)
-    menu_font = pg.font.Font(None, 40)
-    hud_font = pg.font.Font(None, 28)
-    big_font = pg.font.Font(None, 56)
-    input_font = pg.font.Font(None, 36)
-
-    # Channels For Sound and Music
-    channel1 = pg.mixer.Channel(0)
-    channel2 = pg.mixer.Channel(1)
-    channel3 = pg.mixer.Channel(2)
-    songmenu = pg.mixer.Sound("Animal Crossing Population Growing 7 P.M.ogg")
-    songgameover = pg.mixer.Sound("AudioCutter_Hades II - Time Cannot Be Stopped.ogg")
-
+    # Sound effects and music
+    sound_bank = SoundBank(assets.loaded)
 
     init_gl()
-    set_perspective()
-
-    # Game states
-    state = 'menu'  # 'menu', 'enter_name', 'difficulty', 'playing', 'leaderboard', 'game_over'
-    menu_index = 0            # for main menu (Play, Leaderboard)
-    difficulty_index = 1      # 0=Easy,1=Normal,2=Hard
-    difficulties = ['Easy', 'Normal', 'Hard']
-
-    # difficulty presets
-    difficulty_params = [
-        {"spawn_interval": 1.4, "obstacle_speed_start": 12.0, "obstacle_speed_inc": 0.18, "music": "Hotel.ogg"},  # easy
-        {"spawn_interval": 1.0, "obstacle_speed_start": 18.0, "obstacle_speed_inc": 0.3, "music": "Godspeed - Grace CST.ogg"},   # normal
-        {"spawn_interval": 0.6, "obstacle_speed_start": 24.0, "obstacle_speed_inc": 0.45, "music": "Death By Glamour.ogg"},  # hard
-    ]
+    build_car_meshes()
+    obstacle_renderer = ObstacleBatchRenderer()
+    # Sky, track, projection and scene resolution come from the quality tier
+    scene_target = SceneTarget()
+    governor = QualityGovernor(QUALITY_TIERS, QUALITY_TARGET_FPS, QUALITY_TIER)
+    apply_quality(QUALITY_TIERS[governor.tier], obstacle_renderer, scene_target)
+    text_cache = TextCache()
+    hud = hud_layer = None  # built once the fonts have loaded
+
+    # Leaderboard: scores are written on a background thread (which also imports
+    # text lines added since the last run); the game thread only reads
+    leaderboard_store = LeaderboardStore()
+    leaderboard_view = LeaderboardView(leaderboard_store)
+    leaderboard_writer = LeaderboardWriter()
+    leaderboard_writer.start()
+
+    profiler = FrameProfiler(PROFILER_PHASES)
+    show_profiler = False
+    profiler_stats = {}
+    profiler_stats_time = 0.0
+    first_frame_time = None  # seconds from main() to the first frame on screen
+    startup_note = ""
+
+    # Game states (see STATES)
+    state = 'loading'
+    assets_state = None       # state the loader was last prioritized for
+    menu_index = 0            # for main menu (Play, Leaderboard, Watch Replay)
+    difficulty_index = 1      # 0=Easy,1=Normal,2=Hard,3=Rush Hour
 
     # playing variables
-    player_x = 0.0
-    lives = MAX_LIVES
-    score = 0
-    obstacles = []
-    spawn_timer = 0.0
-    obstacle_speed = OBSTACLE_SPEED_START_DEFAULT
-    spawn_interval = SPAWN_INTERVAL_DEFAULT
-    obstacle_speed_inc = OBSTACLE_SPEED_INC_DEFAULT
-    track_offset = 0.0
-    hit_flash_timer = 0.0
+    step_dt = 1.0 / UPDATE_HZ
+    sim = GameSim(DIFFICULTY_PARAMS[difficulty_index], dt=step_dt)
     running = True
     paused = False
-    game_over = False
+    accumulator = 0.0  # time not yet simulated, always < one tick between frames
+    recorder = None    # ReplayRecorder of the game being played
+    watching = None    # ReplayPlayer of the replay being watched
+    pause_bit = 0      # PAUSE until the first tick after a pause
 
     # input name variables
     current_player_name = ""
     name_max_len = 12
 
+    drawn = None  # (state, HUD content key) of the last frame drawn
+
+    def animated():
+        # False when the screen only changes on input: see STATES
+        if not STATES[state]["animated"] or paused:
+            return False
+        return not (sim.game_over or (watching is not None and watching.finished))
+
+    def stop_recording(entry=None):
+        nonlocal recorder
+        if recorder is not None:
+            recorder.close(sim, entry)
+            recorder = None
+
     def start_game_with_difficulty(idx):
-        nonlocal player_x, lives, score, obstacles, spawn_timer, obstacle_speed, spawn_interval, obstacle_speed_inc, game_over, paused
-        params = difficulty_params[idx]
-        player_x = 0.0
-        lives = MAX_LIVES
-        score = 0
-        obstacles = []
-        spawn_timer = 0.0
-        obstacle_speed = params["obstacle_speed_start"]
-        spawn_interval = params["spawn_interval"]
-        obstacle_speed_inc = params["obstacle_speed_inc"]
-        track_offset = 0.0
-        hit_flash_timer = 0.0
-        song1 = pg.mixer.Sound(params["music"])
-        channel1.play(song1, loops=-1)
-        game_over = False
+        nonlocal sim, paused, accumulator, recorder, watching, pause_bit
+        stop_recording()
+        sim = GameSim(DIFFICULTY_PARAMS[idx], dt=step_dt)
+        sound_bank.play_music(DIFFICULTY_MUSIC[idx])
+        paused = False
+        accumulator = 0.0
+        watching = None
+        pause_bit = 0
+        if RECORD_REPLAYS:
+            try:
+                recorder = ReplayRecorder(replay_path(timestamp(), current_player_name or "Player"),
+                                          sim, DIFFICULTIES[idx], current_player_name)
+            except OSError as e:
+                print("Failed to start replay recording:", e)
+
+    def watch_replay(path):
+        nonlocal sim, paused, accumulator, watching
+        try:
+            watching = ReplayPlayer(Replay(path))
+        except (OSError, ValueError) as e:
+            print("Failed to load replay:", e)
+            return False
+        sim = watching.sim
+        difficulty = watching.replay.header.get("difficulty")
+        sound_bank.play_music(DIFFICULTY_MUSIC[DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else 1])
         paused = False
-        return player_x, lives, score, obstacles, spawn_timer, obstacle_speed, spawn_interval, obstacle_speed_inc, game_over, paused
+        accumulator = 0.0
+        return True
 
+    last_time = time.perf_counter()
     while running:
-        dt = clock.tick(60) / 1000.0
+        idle = IDLE_STATIC_STATES and not animated()
+        if idle:
+            # Sleep until something can change; the frame is timed from the wake-up
+            wake = STATES[state].get("wake")
+            timeout = wake() if wake is not None else None
+            if show_profiler:
+                timeout = PROFILER_OVERLAY_REFRESH if timeout is None else min(timeout, PROFILER_OVERLAY_REFRESH)
+            events = wait_events(timeout)
+            profiler.begin_frame()
+            now = time.perf_counter()
+            frame_time = 0.0  # nothing moves in a static state
+        else:
+            profiler.begin_frame()
+            clock.tick(FRAME_RATE_CAP if frame_rate_mode == 'capped' else 0)
+            now = time.perf_counter()
+            frame_time = min(now - last_time, MAX_FRAME_TIME)
+            events = pg.event.get()
+        last_time = frame_start = now
+        profiler.mark("wait")
 
         # events
-        for event in pg.event.get():
+        for event in events:
             if event.type == QUIT:
                 running = False
-            elif event.type == KEYDOWN:
+            elif event.type == KEYDOWN and state != 'loading':
+                if event.key == K_F3:
+                    show_profiler = not show_profiler
+                elif event.key == K_F4:
+                    export_profile(profiler, governor)
+
                 if event.key == K_ESCAPE:
                     if state == 'menu':
                         running = False
                     else:
+                        stop_recording()
                         state = 'menu'
 
                 # menu navigation
@@ -382,13 +1563,19 @@ def main():
                     if event.key in (K_UP, K_w):
                         menu_index = max(0, menu_index - 1)
                     elif event.key in (K_DOWN, K_s):
-                        menu_index = min(1, menu_index + 1)
+                        menu_index = min(len(MENU_OPTIONS) - 1, menu_index + 1)
                     elif event.key in (K_RETURN, K_KP_ENTER):
                         if menu_index == 0:  # Play -> ask for name first
                             current_player_name = ""
                             state = 'enter_name'
-                        else:
+                        elif menu_index == 1:
                             state = 'leaderboard'
+                        else:
+                            replays = list_replays()
+                            if not replays:
+                                print("No replays yet")
+                            elif any(watch_replay(path) for path in reversed(replays)):
+                                state = 'replay'  # the newest one that loads
 
                 # Name input screen
                 elif state == 'enter_name':
@@ -410,10 +1597,9 @@ def main():
                     if event.key in (K_UP, K_w):
                         difficulty_index = max(0, difficulty_index - 1)
                     elif event.key in (K_DOWN, K_s):
-                        difficulty_index = min(2, difficulty_index + 1)
+                        difficulty_index = min(len(DIFFICULTIES) - 1, difficulty_index + 1)
                     elif event.key in (K_RETURN, K_KP_ENTER):
-                        (player_x, lives, score, obstacles, spawn_timer, obstacle_speed,
-                         spawn_interval, obstacle_speed_inc, game_over, paused) = start_game_with_difficulty(difficulty_index)
+                        start_game_with_difficulty(difficulty_index)
                         state = 'playing'
                     elif event.key == K_ESCAPE:
                         state = 'menu'
@@ -421,208 +1607,164 @@ def main():
                 elif state == 'leaderboard':
                     if event.key in (K_ESCAPE, K_RETURN):
                         state = 'menu'
+                    elif event.key in (K_LEFT, K_a):
+                        leaderboard_view.cycle(-1)
+                    elif event.key in (K_RIGHT, K_d):
+                        leaderboard_view.cycle(1)
 
-                elif state == 'playing':
+                elif state in ('playing', 'replay'):
                     if event.key == K_p:
                         paused = not paused
+                        if paused:
+                            pause_bit = PAUSE
+                            sound_bank.pause_music()
+                        else:
+                            sound_bank.unpause_music()
+                    elif state == 'replay' and event.key in (K_RETURN, K_KP_ENTER):
+                        state = 'menu'
 
                 elif state == 'game_over':
                     if event.key == K_r:
                         # restart with same difficulty
-                        (player_x, lives, score, obstacles, spawn_timer, obstacle_speed,
-                         spawn_interval, obstacle_speed_inc, game_over, paused) = start_game_with_difficulty(difficulty_index)
+                        start_game_with_difficulty(difficulty_index)
                         state = 'playing'
                     elif event.key in (K_ESCAPE, K_RETURN):
                         state = 'menu'
 
-        # updates when playing
-        if state == 'playing' and not paused and not game_over:
-            keys = pg.key.get_pressed()
-            move = 0.0
-            if keys[K_LEFT] or keys[K_a]:
-                move -= 1.0
-            if keys[K_RIGHT] or keys[K_d]:
-                move += 1.0
-            player_x += move * PLAYER_SPEED * dt
-            limit = ROAD_WIDTH/2.0 - PLAYER_HALF_WIDTH
-            player_x = max(-limit, min(limit, player_x))
-            if hit_flash_timer > 0:
-                hit_flash_timer -= dt
-            spawn_timer += dt
-            if spawn_timer > spawn_interval:
-                spawn_timer = 0.0
-                road_edge = ROAD_WIDTH/2.0 - OBSTACLE_SIZE
-                x = random.uniform(-road_edge, road_edge)
-                y = GROUND_Y + OBSTACLE_SIZE / 2.0
-                z = OBSTACLE_SPAWN_Z
-                color = (random.random()*0.7 + 0.3, random.random()*0.7 + 0.3, random.random()*0.7 + 0.3)
-                obstacles.append(Obstacle(x, y, z, OBSTACLE_SIZE, color))
-
-            dz = obstacle_speed * dt
-            obstacle_speed += obstacle_speed_inc * dt
-            track_offset += dz
-            remove_list = []
-            for ob in obstacles:
-                ob.update(dz)
-                if check_collision(player_x, ob):
-                    channel2.play(pg.mixer.Sound("car-crash-sound-376882.mp3"))
-                    lives -= 1
-                    remove_list.append(ob)
-                    hit_flash_timer = 1.0
-                    if lives <= 0:
-                        channel3.play(songgameover)
-                        game_over = True
-                elif ob.z > OBSTACLE_END_Z:
-                    channel2.play(pg.mixer.Sound("coin-recieved-230517.mp3"))
-                    score += 10
-                    remove_list.append(ob)
-            for r in remove_list:
-                if r in obstacles:
-                    obstacles.remove(r)
-
-            if game_over:
-                # save score with the name provided earlier (Option A)
-                append_score_to_leaderboard(current_player_name, score)
-                state = 'game_over'
+        # Load what this state needs first; leave the loading screen once the fonts are in
+        if state != assets_state:
+            assets.prioritize(STATE_ASSETS.get(state, ()))
+            assets_state = state
+        if state == 'loading' and assets.ready(HUD_FONTS):
+            hud = Hud(text_cache, {name: assets.loaded.get(name) for name in HUD_FONTS})
+            hud_layer = HudLayer(hud)
+            state = 'menu'
+        profiler.mark("events")
+
+        # updates when playing (or watching a replay)
+        if state in ('playing', 'replay') and not paused and not sim.game_over:
+            if watching is None:
+                keys = pg.key.get_pressed()
+                bits = input_bits(keys[K_LEFT] or keys[K_a], keys[K_RIGHT] or keys[K_d])
+                move = bits_move(bits)
+            accumulator += frame_time
+            hits = scored = steps = 0
+            while accumulator >= sim.dt and not sim.game_over:
+                if steps == MAX_STEPS_PER_FRAME:
+                    # Can't keep up: drop the backlog rather than fall further behind
+                    accumulator = 0.0
+                    break
+                if watching is not None:
+                    step_hits, step_scored = watching.step()
+                    if watching.finished:
+                        accumulator = 0.0
+                        break
+                else:
+                    if recorder is not None:
+                        recorder.record(bits | pause_bit)
+                    pause_bit = 0
+                    step_hits, step_scored = sim.step(move)
+                hits += step_hits
+                scored += step_scored
+                accumulator -= sim.dt
+                steps += 1
+            if hits:
+                sound_bank.play("crash")
+            if scored:
+                sound_bank.play("coin")
+
+            if sim.game_over:
+                sound_bank.play_music(GAME_OVER_MUSIC, loops=0)
+                if watching is None:
+                    # save score with the name provided earlier (Option A)
+                    entry = leaderboard_writer.submit(current_player_name, sim.score, DIFFICULTIES[difficulty_index])
+                    stop_recording(entry)
+                    state = 'game_over'
+
+        profiler.mark("update")
+
+        # A static screen is drawn again only if something on it changed
+        hud_args = dict(menu_index=menu_index, difficulty_index=difficulty_index, player_name=current_player_name,
+                        paused=paused, leaderboard_view=leaderboard_view, replay=watching)
+        if IDLE_STATIC_STATES and state != 'loading' and not animated():
+            key = (state, hud.content_key(state, sim, **hud_args))
+            overlay_due = show_profiler and now - profiler_stats_time > PROFILER_OVERLAY_REFRESH
+            if idle and key == drawn and not overlay_due and all(event.type == MOUSEMOTION for event in events):
+                continue
+            drawn = key
+        else:
+            drawn = None
 
         # ---------- Rendering ----------
+        player_x, track_offset, obstacle_shift = sim.lerp(accumulator / sim.dt)
+        scene_target.begin()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         draw_3d_sun()
+        profiler.mark("sun")
         glPushMatrix()
         draw_racing_track(track_offset)
-        if state in ('playing', 'game_over'):
-            for ob in obstacles:
-                glPushMatrix()
-                glTranslatef(ob.x, ob.y, ob.z)
-                glScalef(1.3, 1.3, 1.3) # Make car slightly bigger than box
-                draw_car(ob.color)
-                glPopMatrix()
-            glPushMatrix()
-            glTranslatef(player_x, PLAYER_Y, PLAYER_Z)
-            glScalef(1.3, 1.3, 1.3)
-            
-            # ### --- NEW: Color Flash Logic ---
-            player_color = (0.1, 0.6, 0.9) # Normal Blue
-            if hit_flash_timer > 0:
-                # Toggle color every 0.1 seconds
-                if int(hit_flash_timer * 10) % 2 == 0:
-                    player_color = (1.0, 0.0, 0.0) # Flash Red
-            
-            draw_car(player_color)
-            glPopMatrix()
+        profiler.mark("track")
+        if state in ('playing', 'game_over', 'replay'):
+            draw_obstacles(obstacle_renderer, sim.obstacles, obstacle_shift)
+            profiler.mark("obstacles")
+            draw_player(sim, player_x)
+            profiler.mark("player")
         glPopMatrix()
+        scene_target.end()
 
         # HUD & Menus
-        glDisable(GL_DEPTH_TEST)
-        glDepthMask(GL_FALSE)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-        # MENU
-        if state == 'menu':
-            title_tex, tw, th = create_text_texture(title_font, "CAR DODGE 3D", (255,255,255))
-            draw_text_ortho(title_tex, tw, th, WIN_W//2 - tw//2, WIN_H//2 - 120)
-            glDeleteTextures([title_tex])
-
-            opts = ["Play", "Leaderboard"]
-            for i, opt in enumerate(opts):
-                color = (255, 220, 40) if i == menu_index else (255,255,255)
-                tex, w, h = create_text_texture(menu_font, opt, color)
-                draw_text_ortho(tex, w, h, WIN_W//2 - w//2, WIN_H//2 - 30 + i*50)
-                glDeleteTextures([tex])
-
-            hint_tex, hw, hh = create_text_texture(hud_font, "Use Up/Down and Enter. Esc to Quit.", (200,200,200))
-            draw_text_ortho(hint_tex, hw, hh, WIN_W//2 - hw//2, WIN_H - 60)
-            glDeleteTextures([hint_tex])
-
-        # ENTER NAME (Option A)
-        elif state == 'enter_name':
-            msg_tex, mw, mh = create_text_texture(title_font, "ENTER YOUR NAME", (255,255,255))
-            draw_text_ortho(msg_tex, mw, mh, WIN_W//2 - mw//2, WIN_H//2 - 120)
-            glDeleteTextures([msg_tex])
-
-            # show current typed name with cursor
-            display_name = current_player_name + ("_" if (time.time() % 1.0) < 0.6 else "")
-            name_tex, nw, nh = create_text_texture(input_font, display_name, (255, 220, 40))
-            draw_text_ortho(name_tex, nw, nh, WIN_W//2 - nw//2, WIN_H//2 - 20)
-            glDeleteTextures([name_tex])
-
-            hint_tex, hw, hh = create_text_texture(hud_font, "Type name (max 12 chars). Press Enter to continue.", (200,200,200))
-            draw_text_ortho(hint_tex, hw, hh, WIN_W//2 - hw//2, WIN_H - 60)
-            glDeleteTextures([hint_tex])
-
-        # DIFFICULTY
-        elif state == 'difficulty':
-            title_tex, tw, th = create_text_texture(title_font, "Select Difficulty", (255,255,255))
-            draw_text_ortho(title_tex, tw, th, WIN_W//2 - tw//2, WIN_H//2 - 130)
-            glDeleteTextures([title_tex])
-
-            for i, d in enumerate(difficulties):
-                color = (255,220,40) if i == difficulty_index else (255,255,255)
-                tex, w, h = create_text_texture(menu_font, d, color)
-                draw_text_ortho(tex, w, h, WIN_W//2 - w//2, WIN_H//2 - 20 + i*50)
-                glDeleteTextures([tex])
-
-            info_tex, iw, ih = create_text_texture(hud_font, "Esc to go back", (200,200,200))
-            draw_text_ortho(info_tex, iw, ih, WIN_W//2 - iw//2, WIN_H - 60)
-            glDeleteTextures([info_tex])
-
-        # LEADERBOARD
-        elif state == 'leaderboard':
-            title_tex, tw, th = create_text_texture(title_font, "LEADERBOARD", (255,255,255))
-            draw_text_ortho(title_tex, tw, th, WIN_W//2 - tw//2, 40)
-            glDeleteTextures([title_tex])
-
-            lines = read_leaderboard_lines()
-            show_lines = list(reversed(lines))[:LEADERBOARD_SHOW_COUNT]
-            if not show_lines:
-                empty_tex, ew, eh = create_text_texture(menu_font, "No scores yet", (200,200,200))
-                draw_text_ortho(empty_tex, ew, eh, WIN_W//2 - ew//2, WIN_H//2 - 20)
-                glDeleteTextures([empty_tex])
-            else:
-                start_y = 120
-                for i, ln in enumerate(show_lines):
-                    tex, w, h = create_text_texture(hud_font, f"{i+1}. {ln}", (230,230,230))
-                    draw_text_ortho(tex, w, h, 60, start_y + i*30)
-                    glDeleteTextures([tex])
-
-            hint_tex, hw, hh = create_text_texture(hud_font, "Esc or Enter to return to menu", (200,200,200))
-            draw_text_ortho(hint_tex, hw, hh, WIN_W//2 - hw//2, WIN_H - 60)
-            glDeleteTextures([hint_tex])
-
-        # PLAYING HUD
-        elif state == 'playing':
-            score_tex, sw, sh = create_text_texture(hud_font, f"Score: {score}", (255,255,255))
-            lives_tex, lw, lh = create_text_texture(hud_font, f"Lives: {lives}", (255,200,80))
-            draw_text_ortho(score_tex, sw, sh, 12, 12)
-            draw_text_ortho(lives_tex, lw, lh, WIN_W - (lw + 12), 12)
-            glDeleteTextures([score_tex, lives_tex])
-
-            if paused:
-                channel1.pause()
-                ptex, pw, ph = create_text_texture(big_font, "PAUSED", (255,255,255))
-                draw_text_ortho(ptex, pw, ph, WIN_W//2 - pw//2, WIN_H//2 - ph//2)
-                glDeleteTextures([ptex])
-
-        # GAME OVER
-        elif state == 'game_over':
-            channel1.pause()
-            score_tex, sw, sh = create_text_texture(hud_font, f"Final Score: {score}", (255,255,255))
-            draw_text_ortho(score_tex, sw, sh, WIN_W//2 - sw//2, WIN_H//2 + 40)
-            glDeleteTextures([score_tex])
-
-            msg1_tex, mw1, mh1 = create_text_texture(big_font, "GAME OVER", (255,40,40))
-            msg2_tex, mw2, mh2 = create_text_texture(menu_font, "Press R to Restart or Esc to Menu", (255,255,255))
-            draw_text_ortho(msg1_tex, mw1, mh1, WIN_W//2 - mw1//2, WIN_H//2 - 90)
-            draw_text_ortho(msg2_tex, mw2, mh2, WIN_W//2 - mw2//2, WIN_H//2 - 20)
-            glDeleteTextures([msg1_tex, msg2_tex])
-
-        # restore 3D state
-        glDepthMask(GL_TRUE)
-        glEnable(GL_DEPTH_TEST)
-
+        begin_hud()
+        if state == 'loading':
+            draw_loading_screen(assets.progress())
+        else:
+            hud_layer.draw(state, sim, **hud_args)
+        profiler.mark("hud")
+
+        if show_profiler and hud is not None:
+            now = time.perf_counter()
+            if now - profiler_stats_time > PROFILER_OVERLAY_REFRESH:
+                profiler_stats = profiler.stats()
+                profiler_stats_time = now
+            cars = "  ".join(f"{name} {n}" for name, n in obstacle_renderer.drawn.items())
+            draw_profiler_overlay(text_cache.glyphs(hud.hud_font), profiler_stats,
+                                  notes=[f"cars: {cars}  culled {obstacle_renderer.culled}",
+                                         f"hud layer: {hud_layer.redraws} redraws",
+                                         f"quality: {governor.name} ({len(governor.log)} changes)",
+                                         f"alive: {RESOURCES.summary()}", startup_note])
+        profiler.mark("overlay")
+        end_hud()
+
+        drawn_at = time.perf_counter()
         pg.display.flip()
-
+        if first_frame_time is None:
+            first_frame_time = time.perf_counter() - startup
+        if not startup_note and assets.done:
+            startup_note = (f"startup: first frame {first_frame_time * 1000:.0f} ms, assets "
+                            f"{(assets.finished_at - startup) * 1000:.0f} ms "
+                            f"({assets.cache_hits}/{len(SFX_FILES)} sounds from cache)")
+            print(startup_note)
+        profiler.mark("flip")
+        profiler.end_frame()
+
+        # Busy time is the frame's own work: with vsync the flip waits for the
+        # display, so it's left out there
+        if ADAPTIVE_QUALITY and state != 'loading' and not idle:
+            busy = (drawn_at if frame_rate_mode == 'vsync' else time.perf_counter()) - frame_start
+            tier = governor.update(frame_time, busy)
+            if tier is not None:
+                apply_quality(QUALITY_TIERS[tier], obstacle_renderer, scene_target)
+
+    assets.close()
+    stop_recording()
+    leaderboard_writer.close()
+    leaderboard_store.close()
+    if hud_layer is not None:
+        hud_layer.delete()
+    text_cache.clear()
+    obstacle_renderer.delete()
+    scene_target.delete()
+    delete_track_meshes()
+    delete_all_meshes()
     pg.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import csv
+import time
+
+import numpy as np
+
+# Adaptive quality. The game loop feeds QualityGovernor every frame's interval
+# (time since the previous frame) and busy time (everything but waiting for
+# the frame cap), and it steps through a list of quality tiers, best first, to
+# hold a target frame rate. What a tier changes is up to the caller (see
+# QUALITY_TIERS in project.py); the governor only picks the index.
+#
+# Steps down go by the intervals, i.e. the frame rate actually delivered.
+# Steps up need headroom in the busy time; GL work the driver finishes
+# asynchronously doesn't show up there, so an optimistic step up is possible
+# and is what the backoff below is for.
+#
+# Hysteresis, so it settles instead of flipping back and forth:
+#   - it steps down as soon as the slow frames (p90) miss the target, but only
+#     steps up after QUALITY_UP_HOLD seconds of clear headroom
+#   - the frames right after a change are ignored while things settle
+#   - an up step that has to be undone soon after doubles the wait before
+#     that tier is tried again
+# Every change goes into `log` (and is printed), for tuning the tiers.
+
+QUALITY_WINDOW = 60         # most recent frames the percentile is taken over
+QUALITY_MIN_FRAMES = 20     # frames needed before a decision (a stray hitch or two is not p90)
+QUALITY_EVAL_INTERVAL = 0.5 # seconds between decisions, so slow frame rates react as fast as quick ones
+QUALITY_PERCENTILE = 90
+QUALITY_DOWN = 1.15         # step down when p90 interval > budget * this (frame cap jitter stays below)
+QUALITY_UP = 0.6            # headroom: p90 busy time < budget * this
+QUALITY_UP_HOLD = 3.0       # seconds of headroom before stepping up
+QUALITY_SETTLE = 1.0        # seconds ignored after a change
+QUALITY_BACKOFF = 10.0      # an up step undone within this many seconds doubles its hold
+
+class QualityGovernor:
+    def __init__(self, tiers, target_fps, tier=0):
+        self.tiers = tiers
+        self.tier = tier
+        self.budget = 1.0 / target_fps
+        self.intervals = np.zeros(QUALITY_WINDOW, dtype=np.float64)  # ring buffers, seconds
+        self.busy = np.zeros(QUALITY_WINDOW, dtype=np.float64)
+        self.count = 0
+        self.hold = [QUALITY_UP_HOLD] * len(tiers)  # seconds of headroom needed to step up into each tier
+        self.headroom_since = None
+        self.started = self.changed_at = self.evaluated_at = time.perf_counter()
+        self.last_up = None  # (time, tier) of the last step up
+        self.log = []        # (seconds since start, from tier name, to tier name, p90 frame ms, p90 busy ms)
+
+    @property
+    def name(self):
+        return self.tiers[self.tier]["name"]
+
+    def update(self, interval, busy, now=None):
+        # Seconds since the previous frame and seconds of work in this one.
+        # Returns the new tier index when it changes, else None.
+        now = time.perf_counter() if now is None else now
+        if now - self.changed_at < QUALITY_SETTLE:
+            return None
+        slot = self.count % QUALITY_WINDOW
+        self.intervals[slot] = interval
+        self.busy[slot] = busy
+        self.count += 1
+        if self.count < QUALITY_MIN_FRAMES or now - self.evaluated_at < QUALITY_EVAL_INTERVAL:
+            return None
+        self.evaluated_at = now
+        n = min(self.count, QUALITY_WINDOW)
+        interval_p90 = float(np.percentile(self.intervals[:n], QUALITY_PERCENTILE))
+        busy_p90 = float(np.percentile(self.busy[:n], QUALITY_PERCENTILE))
+        if interval_p90 > self.budget * QUALITY_DOWN and self.tier < len(self.tiers) - 1:
+            if self.last_up is not None and self.last_up[1] == self.tier and now - self.last_up[0] < QUALITY_BACKOFF:
+                self.hold[self.tier] *= 2.0
+            return self._change(self.tier + 1, now, interval_p90, busy_p90)
+        if busy_p90 < self.budget * QUALITY_UP and self.tier > 0:
+            if self.headroom_since is None:
+                self.headroom_since = now
+            elif now - self.headroom_since >= self.hold[self.tier - 1]:
+                self.last_up = (now, self.tier - 1)
+                return self._change(self.tier - 1, now, interval_p90, busy_p90)
+        else:
+            self.headroom_since = None
+        return None
+
+    def _change(self, tier, now, interval_p90, busy_p90):
+        old = self.name
+        self.tier = tier
+        self.count = 0
+        self.headroom_since = None
+        self.changed_at = now
+        self.log.append((now - self.started, old, self.name, interval_p90 * 1000.0, busy_p90 * 1000.0))
+        print(f"quality: {old} -> {self.name} (p90 frame {interval_p90 * 1000:.1f} ms, busy "
+              f"{busy_p90 * 1000:.1f} ms, budget {self.budget * 1000:.1f} ms)")
+        return tier
+
+    def export_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time_s", "from", "to", "frame_p90_ms", "busy_p90_ms"])
+            for seconds, old, new, interval_p90, busy_p90 in self.log:
+                writer.writerow([f"{seconds:.2f}", old, new, f"{interval_p90:.2f}", f"{busy_p90:.2f}"])
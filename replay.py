@@ -0,0 +1,301 @@
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import time
+
+from simulation import GameSim, input_move
+from leaderboard import LEADERBOARD_PATH, parse_line
+
+# Game replays. A game is fully determined by its seed, its difficulty params
+# and the steering keys held on each tick, so a replay stores just those:
+#
+#   b"CDR1\n"                       magic
+#   {"seed": ..., "params": ...}\n  header (JSON)
+#   varint, varint, ...             input runs: (ticks << 3) | bits
+#   0                               end of inputs
+#   {"score": ..., "ts": ...}       trailer (JSON), then its length (uint32 LE) and b"CDRE"
+#
+# A key held for a second is a single run of one or two bytes, so replays cost
+# a few bytes per second of play. The recorder flushes the header straight
+# away and the inputs about once a second, so files cut short (game killed)
+# have no trailer but still play back up to where they stop.
+#
+#   python replay.py info replays/*.cdr
+#   python replay.py verify              # every replay against CarDodge_Leaderboard.txt
+#   python replay.py play replays/20250101_120000_Sam.cdr
+
+REPLAY_DIR = "replays"
+REPLAY_MAGIC = b"CDR1\n"
+TRAILER_MAGIC = b"CDRE"
+REPLAY_HEADER_KEYS = ("seed", "params", "dt")  # what playback needs
+READ_CHUNK = 64 * 1024
+FLUSH_INTERVAL = 1.0  # seconds of play between flushes of the recorded inputs
+
+# Input bits of one tick
+LEFT = 1
+RIGHT = 2
+PAUSE = 4   # the game was paused right before this tick (no effect on the sim)
+
+def input_bits(left, right):
+    return (LEFT if left else 0) | (RIGHT if right else 0)
+
+def bits_move(bits):
+    return input_move(bits & LEFT, bits & RIGHT)
+
+def _varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+def replay_path(ts, name, directory=None):
+    stamp = ts.replace("-", "").replace(":", "").replace(" ", "_")
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name) or "Player"
+    return os.path.join(directory or REPLAY_DIR, f"{stamp}_{safe}.cdr")
+
+def list_replays(directory=None):
+    # Oldest first (file names start with the timestamp). Not checked: some
+    # may not load (see Replay), e.g. a recording killed before its header
+    # reached the disk.
+    return sorted(glob.glob(os.path.join(directory or REPLAY_DIR, "*.cdr")))
+
+# ---------- Recording ----------
+class ReplayRecorder:
+    # Streams one game's inputs to disk. record() is called once per sim tick
+    # and only writes when the held keys change or a flush is due.
+    def __init__(self, path, sim, difficulty=None, name=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.file = open(path, "wb")
+        header = {"seed": sim.seed, "params": sim.params, "dt": sim.dt,
+                  "difficulty": difficulty, "name": name, "started": time.time()}
+        self.file.write(REPLAY_MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+        self.file.flush()
+        self.bits = None
+        self.run = 0
+        self.ticks = 0
+        self.flush_ticks = max(1, round(FLUSH_INTERVAL / sim.dt))
+
+    def record(self, bits):
+        if bits == self.bits:
+            self.run += 1
+        else:
+            self._flush_run()
+            self.bits = bits
+            self.run = 1
+        self.ticks += 1
+        if self.ticks % self.flush_ticks == 0:
+            # The run so far goes to disk; the rest of it follows as another run
+            self._flush_run()
+            self.file.flush()
+
+    def _flush_run(self):
+        if self.run:
+            self.file.write(_varint((self.run << 3) | self.bits))
+            self.run = 0
+
+    def close(self, sim, entry=None):
+        # entry is the (ts, name, score, difficulty) sent to the leaderboard,
+        # or None for a game that was abandoned
+        if self.file is None:
+            return
+        self._flush_run()
+        trailer = {"ticks": self.ticks, "score": sim.score, "lives": sim.lives,
+                   "time": round(sim.time, 6), "game_over": sim.game_over}
+        if entry is not None:
+            trailer.update(ts=entry[0], name=entry[1], score=entry[2], difficulty=entry[3])
+        data = json.dumps(trailer).encode("utf-8")
+        self.file.write(b"\x00" + data + struct.pack("<I", len(data)) + TRAILER_MAGIC)
+        self.file.close()
+        self.file = None
+
+# ---------- Playback ----------
+class Replay:
+    # A replay file. Only the header is read up front; the trailer and the
+    # inputs are read when first asked for.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.readline() != REPLAY_MAGIC:
+                raise ValueError(f"{path}: not a Car Dodge replay")
+            self.header = json.loads(f.readline())
+            self.body_offset = f.tell()
+        if not isinstance(self.header, dict) or any(key not in self.header for key in REPLAY_HEADER_KEYS):
+            raise ValueError(f"{path}: replay header is incomplete")
+        self._trailer = False
+
+    @property
+    def trailer(self):
+        # Final result dict, or None if the recording was cut short
+        if self._trailer is False:
+            self._trailer = None
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size - self.body_offset >= 8:
+                    f.seek(size - 8)
+                    length, magic = struct.unpack("<I4s", f.read(8))
+                    if magic == TRAILER_MAGIC and length <= size - self.body_offset - 8:
+                        f.seek(size - 8 - length)
+                        self._trailer = json.loads(f.read(length))
+        return self._trailer
+
+    def new_sim(self):
+        header = self.header
+        return GameSim(header["params"], header["seed"], header["dt"])
+
+    def runs(self):
+        # (bits, ticks) runs, decoded while the file is read in chunks
+        with open(self.path, "rb") as f:
+            f.seek(self.body_offset)
+            value = shift = 0
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    return
+                for byte in chunk:
+                    value |= (byte & 0x7F) << shift
+                    if byte & 0x80:
+                        shift += 7
+                        continue
+                    if value == 0:
+                        return
+                    yield value & 7, value >> 3
+                    value = shift = 0
+
+    def input_bytes(self):
+        # Size of the encoded inputs, without header and trailer
+        return sum(len(_varint((ticks << 3) | bits)) for bits, ticks in self.runs())
+
+    def inputs(self):
+        # Input bits for each tick
+        for bits, ticks in self.runs():
+            for _ in range(ticks):
+                yield bits
+
+class ReplayPlayer:
+    # Feeds a replay's inputs into a fresh sim, one tick per step()
+    def __init__(self, replay):
+        self.replay = replay
+        self.sim = replay.new_sim()
+        self._inputs = replay.inputs()
+        self.finished = False
+
+    def step(self):
+        bits = next(self._inputs, None)
+        if bits is None:
+            self.finished = True
+            return 0, 0
+        return self.sim.step(bits_move(bits))
+
+def play(replay):
+    # Plays a replay to the end headlessly and returns the sim
+    sim = replay.new_sim()
+    step = sim.step
+    for bits, ticks in replay.runs():
+        move = bits_move(bits)
+        for _ in range(ticks):
+            step(move)
+    return sim
+
+# ---------- Verification ----------
+def leaderboard_entries(keys, path=None):
+    # Which of keys ((ts, name, score, difficulty) tuples) appear in the text leaderboard
+    keys = set(keys)
+    found = set()
+    if not keys:
+        return found
+    with open(path or LEADERBOARD_PATH, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            entry = parse_line(line)
+            if entry in keys:
+                found.add(entry)
+    return found
+
+def verify(replays, leaderboard_path=None):
+    # Replays every game and checks the result against the replay's recorded
+    # score and the leaderboard line it was saved as. Returns [(replay, problem or None)].
+    results = []
+    claims = {}
+    for replay in replays:
+        trailer = replay.trailer
+        if trailer is None:
+            results.append((replay, "recording is incomplete"))
+            continue
+        sim = play(replay)
+        if sim.ticks != trailer["ticks"] or sim.score != trailer["score"]:
+            results.append((replay, f"replays to {sim.score} in {sim.ticks} ticks, "
+                                    f"recorded {trailer['score']} in {trailer['ticks']} ticks"))
+            continue
+        if "ts" not in trailer:
+            results.append((replay, None))  # abandoned game, never on the leaderboard
+            continue
+        claims[replay.path] = (trailer["ts"], trailer["name"], trailer["score"], trailer["difficulty"])
+        results.append((replay, None))
+    try:
+        listed = leaderboard_entries(claims.values(), leaderboard_path)
+    except OSError as e:
+        listed = set()
+        print("Failed to read leaderboard:", e)
+    checked = []
+    for replay, problem in results:
+        if problem is None and replay.path in claims and claims[replay.path] not in listed:
+            problem = "score is not on the leaderboard"
+        checked.append((replay, problem))
+    return checked
+
+def load_replays(paths):
+    replays = []
+    for path in paths:
+        try:
+            replays.append(Replay(path))
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}")
+    return replays
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, play back and verify Car Dodge replays.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="show replay headers and results")
+    info.add_argument("paths", nargs="+")
+    ver = sub.add_parser("verify", help="replay games and check their scores against the leaderboard")
+    ver.add_argument("paths", nargs="*", help=f"replay files (default: all in {REPLAY_DIR}/)")
+    ver.add_argument("--leaderboard", default=LEADERBOARD_PATH)
+    pl = sub.add_parser("play", help="play replays headlessly")
+    pl.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        for replay in load_replays(args.paths):
+            path = replay.path
+            header, trailer = replay.header, replay.trailer or {}
+            size = os.path.getsize(path)
+            seconds = trailer.get("time", 0.0)
+            rate = f"{replay.input_bytes() / seconds:.1f} input B/s" if seconds else "-"
+            print(f"{path}: {header.get('name')} {header.get('difficulty')} seed {header['seed']}  "
+                  f"score {trailer.get('score', '?')} in {seconds:.1f}s  {size} bytes ({rate})")
+    elif args.command == "verify":
+        replays = load_replays(args.paths or list_replays())
+        problems = 0
+        for replay, problem in verify(replays, args.leaderboard):
+            print(f"{'OK  ' if problem is None else 'FAIL'} {replay.path}" + (f": {problem}" if problem else ""))
+            problems += problem is not None
+        print(f"{len(replays) - problems}/{len(replays)} replays verified")
+        if problems:
+            sys.exit(1)
+    else:
+        for replay in load_replays(args.paths):
+            path = replay.path
+            start = time.perf_counter()
+            sim = play(replay)
+            elapsed = time.perf_counter() - start
+            print(f"{path}: score {sim.score}, lives {sim.lives}, {sim.time:.1f}s of play "
+                  f"replayed in {elapsed:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import threading
+import weakref
+from collections import Counter, deque
+
+from OpenGL.GL import (glGenTextures, glDeleteTextures, glGenBuffers, glDeleteBuffers,
+                       glGenFramebuffers, glDeleteFramebuffers, glGenRenderbuffers,
+                       glDeleteRenderbuffers, glGenLists, glDeleteLists, glDeleteProgram)
+from OpenGL.GLU import gluNewQuadric, gluDeleteQuadric
+import pygame as pg
+
+# GL and audio resource accounting. Every texture, buffer, framebuffer,
+# renderbuffer, display list, shader program and GLU quadric the game makes is
+# created and deleted through the wrappers below, and every mixer Sound is
+# registered with track_sound(), so RESOURCES always knows what is alive and
+# roughly how many bytes it holds. Sounds are freed by the garbage collector,
+# so they leave the registry when they are collected.
+#
+# The asset loader registers sounds from its own thread and collection can
+# happen on any thread, so the registry is locked. Finalizers only queue the
+# release (they may run in the middle of a locked call) and the next call
+# applies it.
+#
+# A leak shows up as a count that keeps growing while the game goes round the
+# same screens; bench.py --soak checks exactly that.
+#
+#   from resources import RESOURCES
+#   RESOURCES.summary()    # "texture 41 (2.3 MB)  buffer 4 (0.1 MB)  ..."
+
+KINDS = ["texture", "buffer", "framebuffer", "renderbuffer", "list", "program", "quadric", "sound"]
+
+class ResourceRegistry:
+    def __init__(self):
+        self.live = {kind: {} for kind in KINDS}  # kind -> {handle: (bytes, label)}
+        self.created = dict.fromkeys(KINDS, 0)
+        self.deleted = dict.fromkeys(KINDS, 0)
+        self.unknown_deletes = 0  # handles deleted that were never registered (or deleted twice)
+        self.lock = threading.Lock()
+        self.released = deque()   # (kind, handle) collected since the last call
+
+    def add(self, kind, handle, nbytes=0, label=""):
+        with self.lock:
+            self._apply_released()
+            self.live[kind][handle] = (nbytes, label)
+            self.created[kind] += 1
+
+    def set_bytes(self, kind, handle, nbytes):
+        with self.lock:
+            entry = self.live[kind].get(handle)
+            if entry is not None and entry[0] != nbytes:
+                self.live[kind][handle] = (nbytes, entry[1])
+
+    def remove(self, kind, handle):
+        with self.lock:
+            self._apply_released()
+            self._remove(kind, handle)
+
+    def release(self, kind, handle):
+        # remove() for finalizers: safe from any thread, takes no lock
+        self.released.append((kind, handle))
+
+    def _remove(self, kind, handle):
+        if self.live[kind].pop(handle, None) is None:
+            self.unknown_deletes += 1
+        else:
+            self.deleted[kind] += 1
+
+    def _apply_released(self):
+        while self.released:
+            self._remove(*self.released.popleft())
+
+    def counts(self):
+        with self.lock:
+            self._apply_released()
+            return {kind: len(live) for kind, live in self.live.items()}
+
+    def bytes(self):
+        with self.lock:
+            self._apply_released()
+            return self._bytes()
+
+    def _bytes(self):
+        return {kind: sum(nbytes for nbytes, _ in live.values()) for kind, live in self.live.items()}
+
+    def labels(self, kind):
+        # How many live resources of a kind each label has
+        with self.lock:
+            self._apply_released()
+            return Counter(label for _, label in self.live[kind].values())
+
+    def snapshot(self):
+        # {kind: (count, bytes, label counts)}, for growth()
+        with self.lock:
+            self._apply_released()
+            sizes = self._bytes()
+            return {kind: (len(live), sizes[kind], Counter(label for _, label in live.values()))
+                    for kind, live in self.live.items()}
+
+    def growth(self, before, after=None):
+        # [(kind, count before, count after, labels that grew)] for every kind
+        # with more live resources in after (default: now) than in before
+        after = after or self.snapshot()
+        grown = []
+        for kind in KINDS:
+            count0, _, labels0 = before[kind]
+            count1, _, labels1 = after[kind]
+            if count1 > count0:
+                grown.append((kind, count0, count1, dict(labels1 - labels0)))
+        return grown
+
+    def summary(self):
+        with self.lock:
+            self._apply_released()
+            sizes = self._bytes()
+            counts = {kind: len(live) for kind, live in self.live.items()}
+        parts = []
+        for kind, count in counts.items():
+            if count:
+                parts.append(f"{kind} {count}" + (f" ({sizes[kind] / 1e6:.1f} MB)" if sizes[kind] else ""))
+        return "  ".join(parts) or "none"
+
+RESOURCES = ResourceRegistry()
+
+# ---------- GL ----------
+def gen_texture(nbytes=0, label=""):
+    tex_id = int(glGenTextures(1))
+    RESOURCES.add("texture", tex_id, nbytes, label)
+    return tex_id
+
+def delete_textures(tex_ids):
+    tex_ids = [int(tex_id) for tex_id in tex_ids]
+    if tex_ids:
+        glDeleteTextures(tex_ids)
+    for tex_id in tex_ids:
+        RESOURCES.remove("texture", tex_id)
+
+def gen_buffer(nbytes=0, label=""):
+    buffer_id = int(glGenBuffers(1))
+    RESOURCES.add("buffer", buffer_id, nbytes, label)
+    return buffer_id
+
+def delete_buffers(buffer_ids):
+    buffer_ids = [int(buffer_id) for buffer_id in buffer_ids]
+    if buffer_ids:
+        glDeleteBuffers(len(buffer_ids), buffer_ids)
+    for buffer_id in buffer_ids:
+        RESOURCES.remove("buffer", buffer_id)
+
+def gen_framebuffer(label=""):
+    fbo = int(glGenFramebuffers(1))
+    RESOURCES.add("framebuffer", fbo, 0, label)
+    return fbo
+
+def delete_framebuffer(fbo):
+    glDeleteFramebuffers(1, [int(fbo)])
+    RESOURCES.remove("framebuffer", int(fbo))
+
+def gen_renderbuffer(nbytes=0, label=""):
+    rb = int(glGenRenderbuffers(1))
+    RESOURCES.add("renderbuffer", rb, nbytes, label)
+    return rb
+
+def delete_renderbuffers(rbs):
+    rbs = [int(rb) for rb in rbs]
+    if rbs:
+        glDeleteRenderbuffers(len(rbs), rbs)
+    for rb in rbs:
+        RESOURCES.remove("renderbuffer", rb)
+
+def gen_list(label=""):
+    list_id = int(glGenLists(1))
+    RESOURCES.add("list", list_id, 0, label)
+    return list_id
+
+def delete_list(list_id):
+    glDeleteLists(list_id, 1)
+    RESOURCES.remove("list", list_id)
+
+def track_program(program, label=""):
+    RESOURCES.add("program", int(program), 0, label)
+    return program
+
+def delete_program(program):
+    glDeleteProgram(program)
+    RESOURCES.remove("program", int(program))
+
+def new_quadric(label=""):
+    quadric = gluNewQuadric()
+    RESOURCES.add("quadric", id(quadric), 0, label)
+    return quadric
+
+def delete_quadric(quadric):
+    gluDeleteQuadric(quadric)
+    RESOURCES.remove("quadric", id(quadric))
+
+# ---------- Audio ----------
+def sound_bytes(sound):
+    # Size of a Sound's samples in the mixer's format
+    init = pg.mixer.get_init()
+    if init is None:
+        return 0
+    frequency, size, channels = init
+    return int(sound.get_length() * frequency) * channels * (abs(size) // 8)
+
+def track_sound(sound, label=""):
+    # Registers a Sound until it is garbage collected
+    key = id(sound)
+    RESOURCES.add("sound", key, sound_bytes(sound), label)
+    weakref.finalize(sound, RESOURCES.release, "sound", key)
+    return sound
@@ -0,0 +1,505 @@
+import argparse
+import math
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+# Gameplay simulation for Car Dodge: spawning, movement, collision and scoring.
+# No pygame, GL or mixer in here, so it can be driven from scripts and run
+# headless (python simulation.py --help).
+
+# ---------- Configuration ----------
+GROUND_Y = -1.5
+PLAYER_Y = GROUND_Y + 0.4
+PLAYER_Z = 0.0
+PLAYER_HALF_WIDTH = 0.9
+PLAYER_HALF_DEPTH = 0.6
+PLAYER_SPEED = 10.0
+OBSTACLE_SIZE = 1.5
+OBSTACLE_SPAWN_Z = -60.0
+OBSTACLE_END_Z = 4.0
+ROAD_WIDTH = 14.0
+
+# Default gameplay params (will be overridden by difficulty)
+SPAWN_INTERVAL_DEFAULT = 1.0
+OBSTACLE_SPEED_START_DEFAULT = 18.0
+OBSTACLE_SPEED_INC_DEFAULT = 0.3
+MAX_LIVES = 3
+SCORE_PER_OBSTACLE = 10
+
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+
+# difficulty presets. "lanes" switches to lane traffic from a RushSchedule
+# (spawn_interval is unused then).
+DIFFICULTIES = ['Easy', 'Normal', 'Hard', 'Rush Hour']
+DIFFICULTY_PARAMS = [
+    {"spawn_interval": 1.4, "obstacle_speed_start": 12.0, "obstacle_speed_inc": 0.18},  # easy
+    {"spawn_interval": 1.0, "obstacle_speed_start": 18.0, "obstacle_speed_inc": 0.3},   # normal
+    {"spawn_interval": 0.6, "obstacle_speed_start": 24.0, "obstacle_speed_inc": 0.45},  # hard
+    {"spawn_interval": 1.0, "obstacle_speed_start": 16.0, "obstacle_speed_inc": 0.2, "lanes": 7},  # rush hour
+]
+
+# Rush hour (lane traffic)
+RUSH_SLOT = 2.5          # road length of one row of cars: a car and a gap
+RUSH_LEAD_IN = 20.0      # empty road before the first wave
+RUSH_REACTION = 0.35     # seconds allowed on top of the steering time before each wave
+RUSH_CLEAR = PLAYER_HALF_DEPTH + OBSTACLE_SIZE / 2.0 + 0.1  # a row is behind the player this far past it
+RUSH_HORIZON = 200.0     # road distance kept scheduled ahead of the spawn point
+RUSH_BATCH = 40.0        # road distance of waves generated at a time
+
+# ---------- Obstacles ----------
+class ObstaclePool:
+    # Obstacles as parallel NumPy arrays (structure of arrays). Live obstacles
+    # are slots [head, tail), oldest first. They all spawn at the same z and
+    # move at the same speed, so oldest first is also nearest the player first:
+    # obstacles that get past the player leave from the front in O(1), and
+    # collision only tests the few at the front that are within reach.
+    def __init__(self, capacity=64):
+        self.head = 0
+        self.tail = 0
+        self.pos = np.zeros((capacity, 3), dtype=np.float64)     # x, y, z
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self.color = np.zeros((capacity, 3), dtype=np.float32)
+        # Collision reach against the player per axis, fixed at spawn time
+        self.reach = np.zeros((capacity, 2), dtype=np.float64)
+        self.max_reach_z = 0.0
+
+    @property
+    def count(self):
+        return self.tail - self.head
+
+    @property
+    def positions(self):
+        return self.pos[self.head:self.tail]
+
+    @property
+    def colors(self):
+        return self.color[self.head:self.tail]
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def _make_room(self, extra=1):
+        # The arrays are full up to the end: slide the live slots back to 0,
+        # doubling the arrays if they are more than half full (or extra won't fit)
+        n = self.tail - self.head
+        capacity = len(self.size)
+        if n * 2 > capacity:
+            capacity *= 2
+        while n + extra > capacity:
+            capacity *= 2
+        for name in ("pos", "size", "color", "reach"):
+            old = getattr(self, name)
+            new = old if capacity == len(old) else np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:n] = old[self.head:self.tail]
+            setattr(self, name, new)
+        self.head, self.tail = 0, n
+
+    def spawn(self, x, y, z, size, color):
+        if self.tail == len(self.size):
+            self._make_room()
+        i = self.tail
+        self.pos[i] = (x, y, z)
+        self.size[i] = size
+        self.color[i] = color
+        self.reach[i] = (PLAYER_HALF_WIDTH + size / 2.0, PLAYER_HALF_DEPTH + size / 2.0)
+        self.max_reach_z = max(self.max_reach_z, PLAYER_HALF_DEPTH + size / 2.0)
+        self.tail += 1
+
+    def spawn_many(self, x, y, z, size, color):
+        # spawn() for arrays of x, z and colours (n x 3), sharing y and size
+        n = len(x)
+        if self.tail + n > len(self.size):
+            self._make_room(n)
+        i, j = self.tail, self.tail + n
+        self.pos[i:j, 0] = x
+        self.pos[i:j, 1] = y
+        self.pos[i:j, 2] = z
+        self.size[i:j] = size
+        self.color[i:j] = color
+        self.reach[i:j] = (PLAYER_HALF_WIDTH + size / 2.0, PLAYER_HALF_DEPTH + size / 2.0)
+        self.max_reach_z = max(self.max_reach_z, PLAYER_HALF_DEPTH + size / 2.0)
+        self.tail = j
+
+    def clear(self):
+        self.head = self.tail = 0
+        self.max_reach_z = 0.0
+
+    def _remove(self, i):
+        # Removes slot i, keeping the order, by moving the (few) slots in front of it up by one
+        head = self.head
+        if i > head:
+            for arr in (self.pos, self.size, self.color, self.reach):
+                arr[head + 1:i + 1] = arr[head:i]
+        self.head = head + 1
+
+    def window(self, z_min, z_max):
+        # Slot range [start, stop) of the obstacles with z_min <= z <= z_max
+        z = self.pos[:, 2]
+        start, tail = self.head, self.tail
+        while start < tail and z[start] > z_max:
+            start += 1
+        stop = start
+        while stop < tail and z[stop] >= z_min:
+            stop += 1
+        return start, stop
+
+    def _swept_hit(self, i, dz, x0, x1):
+        # Did obstacle i's box touch the player's during a step in which it
+        # moved dz along z and the player moved from x0 to x1? Both motions are
+        # linear, so this is exact however large the step is.
+        reach_x, reach_z = self.reach[i]
+        ox, z1 = self.pos[i, 0], self.pos[i, 2]
+        z0 = z1 - dz
+        lo, hi = PLAYER_Z - reach_z, PLAYER_Z + reach_z
+        if z1 < lo or z0 > hi:
+            return False
+        # Part of the step [t0, t1] during which the boxes overlap in z
+        t0, t1 = 0.0, 1.0
+        if dz > 0.0:
+            t0 = max(0.0, (lo - z0) / dz)
+            t1 = min(1.0, (hi - z0) / dz)
+        a = ox - (x0 + (x1 - x0) * t0)
+        b = ox - (x0 + (x1 - x0) * t1)
+        # The x distance moves linearly from a to b
+        return min(a, b) <= reach_x and max(a, b) >= -reach_x
+
+    def step(self, dz, player_x, prev_x=None):
+        # Moves every obstacle by dz and tests the ones near the player against
+        # its box, swept over the step. Returns (hits, scored) counts; both are
+        # removed from the pool.
+        head, tail = self.head, self.tail
+        if head == tail:
+            return 0, 0
+        z = self.pos[:, 2]
+        z[head:tail] += dz
+        if prev_x is None:
+            prev_x = player_x
+
+        hits = 0
+        near = PLAYER_Z - self.max_reach_z
+        i = head
+        while i < tail and z[i] >= near:
+            if self._swept_hit(i, dz, prev_x, player_x):
+                self._remove(i)
+                hits += 1
+            i += 1
+
+        scored = 0
+        head = self.head
+        while head < tail and z[head] > OBSTACLE_END_Z:
+            head += 1
+            scored += 1
+        self.head = head
+        return hits, scored
+
+# ---------- Rush hour ----------
+class RushSchedule:
+    # Lane traffic, generated from the sim's rng ahead of time. Cars come in
+    # waves on fixed lanes (walls with a gap, staggered columns, solid columns)
+    # and are kept as arrays of road distance, x and colour, sorted by
+    # distance: a car spawns when track_offset reaches its distance. A tick
+    # only moves a cursor past the cars it spawns, so its cost doesn't depend
+    # on how many are scheduled; waves are generated a few at a time.
+    #
+    # Every wave leaves one lane open (the corridor), and the empty road
+    # before the next wave is long enough to steer over to that wave's
+    # corridor at the speed the cars will have by then, plus RUSH_REACTION.
+    # Lanes the player has to cross stay clear in between, so every wave
+    # can be passed.
+    def __init__(self, params, rng):
+        self.lanes = params["lanes"]
+        self.lane_width = ROAD_WIDTH / self.lanes
+        self.speed_start = params["obstacle_speed_start"]
+        self.speed_inc = params["obstacle_speed_inc"]
+        self.rng = rng
+        self.dist = np.zeros(0, dtype=np.float64)
+        self.x = np.zeros(0, dtype=np.float64)
+        self.color = np.zeros((0, 3), dtype=np.float32)
+        self.cursor = 0
+        self.lane = self.lanes // 2
+        self.end = RUSH_LEAD_IN  # road distance of the next wave
+        # (road distance from which a lane is the one to be in, lane), in order
+        self.corridor = deque([(-math.inf, self.lane)])
+
+    def lane_x(self, lane):
+        return -ROAD_WIDTH / 2.0 + (lane + 0.5) * self.lane_width
+
+    def gap(self, last, lanes_crossed):
+        # Road distance needed after a row at distance last before the next
+        # row, to steer across lanes_crossed lanes. The cars keep speeding up
+        # (speed^2 = start^2 + 2 * inc * track distance), so this solves
+        # gap = depth + time * speed(when the next row reaches the player).
+        time_needed = lanes_crossed * self.lane_width / PLAYER_SPEED + RUSH_REACTION
+        depth = 2.0 * RUSH_CLEAR
+        a = self.speed_start ** 2 + 2.0 * self.speed_inc * (last - OBSTACLE_SPAWN_Z + depth)
+        b = 2.0 * self.speed_inc
+        t2 = time_needed * time_needed
+        return max(RUSH_SLOT, depth + (t2 * b + math.sqrt(t2 * t2 * b * b + 4.0 * t2 * a)) / 2.0)
+
+    def _wave(self, rows):
+        # Appends one wave and the gap after it to rows ((distance, lanes) pairs)
+        rng, lanes, lane = self.rng, self.lanes, self.lane
+        others = [i for i in range(lanes) if i != lane]
+        d = self.end
+        kind = rng.random()
+        if kind < 0.35:
+            # Wall with a gap, sometimes two lanes wide
+            blocked = set(others)
+            if rng.random() < 0.5:
+                blocked.discard(lane + rng.choice((-1, 1)))
+            wave = [blocked]
+        elif kind < 0.7:
+            # Staggered columns
+            period = rng.randint(2, 3)
+            phase = [rng.randrange(period) for _ in range(lanes)]
+            wave = [[i for i in others if (r + phase[i]) % period == 0] for r in range(rng.randint(4, 10))]
+        else:
+            # Solid columns in some lanes
+            columns = rng.sample(others, rng.randint(2, len(others)))
+            wave = [columns] * rng.randint(4, 12)
+        for r, blocked in enumerate(wave):
+            rows.append((d + r * RUSH_SLOT, sorted(blocked)))
+        last = d + (len(wave) - 1) * RUSH_SLOT
+
+        new_lane = min(lanes - 1, max(0, lane + rng.randint(-3, 3)))
+        gap = self.gap(last, abs(new_lane - lane))
+        # Lanes the player doesn't cross can keep their traffic through the gap
+        lo, hi = min(lane, new_lane), max(lane, new_lane)
+        side = [i for i in range(lanes) if (i < lo or i > hi) and rng.random() < 0.4]
+        if side:
+            for k in range(1, int(gap / RUSH_SLOT)):
+                rows.append((last + k * RUSH_SLOT, side))
+        self.corridor.append((last + RUSH_CLEAR, new_lane))
+        self.lane = new_lane
+        self.end = last + gap
+
+    def _extend(self, until):
+        # Generates waves up to road distance until. Cars already spawned are
+        # dropped from the arrays at the same time.
+        rows = []
+        while self.end < until:
+            self._wave(rows)
+        rows.sort(key=lambda row: row[0])  # side traffic overlaps the next wave's distances
+        rng = self.rng
+        dist = [d for d, blocked in rows for _ in blocked]
+        x = [self.lane_x(i) for _, blocked in rows for i in blocked]
+        color = [(rng.random()*0.7 + 0.3, rng.random()*0.7 + 0.3, rng.random()*0.7 + 0.3) for _ in dist]
+        self.dist = np.concatenate((self.dist[self.cursor:], dist))
+        self.x = np.concatenate((self.x[self.cursor:], x))
+        self.color = np.concatenate((self.color[self.cursor:], np.array(color, dtype=np.float32).reshape(-1, 3)))
+        self.cursor = 0
+
+    @property
+    def pending(self):
+        return len(self.dist) - self.cursor
+
+    def spawn_due(self, pool, track_offset):
+        # Spawns the cars whose distance the track has reached, each placed as
+        # far down the road as it would have got by now (rows don't line up
+        # with ticks). Returns how many spawned.
+        if self.end - track_offset < RUSH_HORIZON:
+            self._extend(track_offset + RUSH_HORIZON + RUSH_BATCH)
+        dist = self.dist
+        start = stop = self.cursor
+        n = len(dist)
+        while stop < n and dist[stop] <= track_offset:
+            stop += 1
+        if stop > start:
+            pool.spawn_many(self.x[start:stop], GROUND_Y + OBSTACLE_SIZE / 2.0,
+                            OBSTACLE_SPAWN_Z + (track_offset - dist[start:stop]),
+                            OBSTACLE_SIZE, self.color[start:stop])
+            self.cursor = stop
+        return stop - start
+
+    def corridor_lane(self, at):
+        # The open lane for rows at road distance at (rows at track_offset +
+        # OBSTACLE_SPAWN_Z are level with the player)
+        corridor = self.corridor
+        while len(corridor) > 1 and corridor[1][0] <= at:
+            corridor.popleft()
+        return corridor[0][1]
+
+# ---------- Simulation ----------
+def input_move(left, right):
+    # Steering input from the two direction keys: -1 (left), 0 or +1 (right)
+    return (1.0 if right else 0.0) - (1.0 if left else 0.0)
+
+class GameSim:
+    # One game of Car Dodge. All randomness comes from the seed, so the same
+    # seed and input sequence always produce the same game.
+    def __init__(self, params=None, seed=None, dt=SIM_DT):
+        self.params = params or DIFFICULTY_PARAMS[1]
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.dt = dt
+        self.reset()
+
+    def reset(self):
+        self.rng = random.Random(self.seed)
+        self.player_x = 0.0
+        self.lives = MAX_LIVES
+        self.score = 0
+        self.obstacles = ObstaclePool()
+        self.schedule = RushSchedule(self.params, self.rng) if self.params.get("lanes") else None
+        self.spawn_timer = 0.0
+        self.obstacle_speed = self.params["obstacle_speed_start"]
+        self.spawn_interval = self.params["spawn_interval"]
+        self.obstacle_speed_inc = self.params["obstacle_speed_inc"]
+        self.track_offset = 0.0
+        # State before the last tick, for drawing between ticks (see lerp)
+        self.prev_player_x = 0.0
+        self.last_dz = 0.0
+        self.hit_flash_timer = 0.0
+        self.time = 0.0
+        self.ticks = 0
+        self.game_over = False
+
+    def spawn_obstacle(self):
+        rng = self.rng
+        road_edge = ROAD_WIDTH/2.0 - OBSTACLE_SIZE
+        x = rng.uniform(-road_edge, road_edge)
+        y = GROUND_Y + OBSTACLE_SIZE / 2.0
+        color = (rng.random()*0.7 + 0.3, rng.random()*0.7 + 0.3, rng.random()*0.7 + 0.3)
+        self.obstacles.spawn(x, y, OBSTACLE_SPAWN_Z, OBSTACLE_SIZE, color)
+
+    def step(self, move, dt=None):
+        # Advances the game by one tick with steering input move in [-1, 1].
+        # Returns (hits, scored): how many obstacles hit the player / were dodged.
+        if self.game_over:
+            return 0, 0
+        dt = self.dt if dt is None else dt
+        self.prev_player_x = self.player_x
+        limit = ROAD_WIDTH/2.0 - PLAYER_HALF_WIDTH
+        self.player_x = max(-limit, min(limit, self.player_x + move * PLAYER_SPEED * dt))
+        if self.hit_flash_timer > 0:
+            self.hit_flash_timer -= dt
+        if self.schedule is not None:
+            self.schedule.spawn_due(self.obstacles, self.track_offset)
+        else:
+            self.spawn_timer += dt
+            if self.spawn_timer > self.spawn_interval:
+                self.spawn_timer = 0.0
+                self.spawn_obstacle()
+
+        dz = self.obstacle_speed * dt
+        self.last_dz = dz
+        self.obstacle_speed += self.obstacle_speed_inc * dt
+        self.track_offset += dz
+        hits, scored = self.obstacles.step(dz, self.player_x, self.prev_player_x)
+        if hits:
+            self.lives -= hits
+            self.hit_flash_timer = 1.0
+            if self.lives <= 0:
+                self.game_over = True
+        self.score += SCORE_PER_OBSTACLE * scored
+        self.time += dt
+        self.ticks += 1
+        return hits, scored
+
+    def lerp(self, alpha):
+        # Where things are drawn alpha (0..1) of the way from the previous tick
+        # to the current one: (player_x, track_offset, obstacle z shift). Every
+        # obstacle moves by the same dz, so one shift covers all of them.
+        back = 1.0 - alpha
+        return (self.player_x - (self.player_x - self.prev_player_x) * back,
+                self.track_offset - self.last_dz * back,
+                -self.last_dz * back)
+
+# ---------- Input policies ----------
+# A policy is called with the sim before every tick and returns the steering input.
+def idle_policy(sim):
+    return 0.0
+
+class RandomPolicy:
+    # Holds a random direction for a random short time, like a player mashing keys
+    def __init__(self, seed=None, min_hold=0.1, max_hold=0.6):
+        self.rng = random.Random(seed)
+        self.min_hold = min_hold
+        self.max_hold = max_hold
+        self.move = 0.0
+        self.until = 0.0
+
+    def __call__(self, sim):
+        if sim.time >= self.until:
+            self.move = self.rng.choice((-1.0, 0.0, 1.0))
+            self.until = sim.time + self.rng.uniform(self.min_hold, self.max_hold)
+        return self.move
+
+def dodge_policy(sim, lookahead=25.0):
+    # Steers away from the closest obstacle ahead that overlaps the player's lane
+    obstacles = sim.obstacles
+    reach_x = PLAYER_HALF_WIDTH + OBSTACLE_SIZE / 2.0 + 0.2
+    start, stop = obstacles.window(PLAYER_Z - lookahead, PLAYER_Z + PLAYER_HALF_DEPTH + OBSTACLE_SIZE / 2.0)
+    pos = obstacles.pos
+    # Closest first, so the first one in the player's lane is the threat
+    for i in range(start, stop):
+        if abs(pos[i, 0] - sim.player_x) < reach_x:
+            threat_x = pos[i, 0]
+            break
+    else:
+        return 0.0
+    limit = ROAD_WIDTH/2.0 - PLAYER_HALF_WIDTH
+    move = -1.0 if threat_x > sim.player_x else 1.0
+    # Pinned against the edge: the only way out is the other side
+    if (move < 0 and sim.player_x <= -limit + 0.1) or (move > 0 and sim.player_x >= limit - 0.1):
+        move = -move
+    return move
+
+def corridor_policy(sim):
+    # Lane modes: follows the schedule's open lane, so it should never be hit
+    # (a check of the passability guarantee). Plays dodge_policy otherwise.
+    schedule = sim.schedule
+    if schedule is None:
+        return dodge_policy(sim)
+    target = schedule.lane_x(schedule.corridor_lane(sim.track_offset + OBSTACLE_SPAWN_Z))
+    if abs(target - sim.player_x) <= PLAYER_SPEED * sim.dt / 2.0:
+        return 0.0
+    return 1.0 if target > sim.player_x else -1.0
+
+POLICIES = {
+    "idle": lambda seed: idle_policy,
+    "random": lambda seed: RandomPolicy(seed),
+    "dodge": lambda seed: dodge_policy,
+    "corridor": lambda seed: corridor_policy,
+}
+
+# ---------- Headless runner ----------
+def play_headless(params, policy, seed=None, max_time=600.0, dt=SIM_DT):
+    # Plays one game to the end (or max_time seconds) and returns its result
+    sim = GameSim(params, seed, dt)
+    max_ticks = int(math.ceil(max_time / dt))
+    while not sim.game_over and sim.ticks < max_ticks:
+        sim.step(policy(sim))
+    return {"seed": sim.seed, "score": sim.score, "time": sim.time, "lives": sim.lives}
+
+def run_games(params, policy_name, games, seed=0, max_time=600.0, dt=SIM_DT):
+    # Game i uses seed + i for both the sim and the policy
+    make_policy = POLICIES[policy_name]
+    return [play_headless(params, make_policy(seed + i), seed + i, max_time, dt) for i in range(games)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Car Dodge headless with a scripted input policy.")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default="Normal")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="dodge")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-time", type=float, default=600.0, help="seconds of game time per game")
+    args = parser.parse_args()
+
+    params = DIFFICULTY_PARAMS[DIFFICULTIES.index(args.difficulty)]
+    start = time.perf_counter()
+    results = run_games(params, args.policy, args.games, args.seed, args.max_time)
+    elapsed = time.perf_counter() - start
+
+    scores = np.array([r["score"] for r in results])
+    times = np.array([r["time"] for r in results])
+    print(f"{args.games} games ({args.difficulty}, {args.policy}) in {elapsed:.2f}s "
+          f"= {args.games / elapsed:.0f} games/s, {times.sum() / elapsed:.0f}x real time")
+    print(f"score: mean {scores.mean():.1f}  median {np.median(scores):.0f}  max {scores.max()}")
+    print(f"survival: mean {times.mean():.1f}s  median {np.median(times):.1f}s  max {times.max():.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from simulation import DIFFICULTY_PARAMS, POLICIES, run_games
+
+# Difficulty tuning sweep: plays many headless games for every combination of
+# spawn_interval / obstacle_speed_start / obstacle_speed_inc across a process
+# pool and appends one JSON line of score/survival statistics per configuration.
+# Re-running with the same --out skips configurations that are already there,
+# played with the same --policy, --games, --seed and --max-time.
+#
+#   python sweep.py --spawn-interval 0.6:1.4:5 --speed-start 12:24:4 --speed-inc 0.15:0.45:3
+#   python sweep.py --samples 200 --games 500 --policy random --out random_sweep.jsonl
+
+PARAM_NAMES = ["spawn_interval", "obstacle_speed_start", "obstacle_speed_inc"]
+SURVIVAL_BIN = 10.0  # seconds per survival-time histogram bin
+SCORE_BIN = 100      # points per score histogram bin
+
+def parse_range(text):
+    # "start:stop:steps" (or a single value) -> (start, stop, steps)
+    parts = [float(p) for p in text.split(":")]
+    if len(parts) == 1:
+        return parts[0], parts[0], 1
+    start, stop = parts[0], parts[1]
+    steps = int(parts[2]) if len(parts) > 2 else 2
+    return start, stop, steps
+
+def config_key(params, policy, games, seed, max_time):
+    # A configuration only counts as done if it was played the same way
+    return json.dumps([round(params[name], 6) for name in PARAM_NAMES] + [policy, games, seed, max_time])
+
+def grid_configs(ranges):
+    axes = [np.linspace(start, stop, steps) for start, stop, steps in ranges]
+    mesh = np.meshgrid(*axes, indexing="ij")
+    return [dict(zip(PARAM_NAMES, (round(float(v), 6) for v in values)))
+            for values in zip(*(m.ravel() for m in mesh))]
+
+def random_configs(ranges, samples, seed):
+    rng = random.Random(seed)
+    return [{name: round(rng.uniform(start, stop), 6) for name, (start, stop, _) in zip(PARAM_NAMES, ranges)}
+            for _ in range(samples)]
+
+def play_chunk(params, policy, first_seed, games, max_time):
+    # Runs in a worker process
+    results = run_games(params, policy, games, first_seed, max_time)
+    return ([r["score"] for r in results], [r["time"] for r in results])
+
+def summarize(values, bin_width):
+    values = np.asarray(values, dtype=np.float64)
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    hist = np.bincount((values // bin_width).astype(np.int64)).tolist()
+    return {
+        "mean": round(float(values.mean()), 3),
+        "std": round(float(values.std()), 3),
+        "p10": round(float(p10), 3),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "max": round(float(values.max()), 3),
+        "hist": hist,
+    }
+
+def load_done(path):
+    # Keys of configurations already in the result file. A line cut short by a
+    # killed run is dropped and its configuration is played again.
+    done = set()
+    if not os.path.exists(path):
+        return done
+    good = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            done.add(config_key(record["params"], record.get("policy"), record.get("games"),
+                                record.get("seed"), record.get("max_time")))
+            good.append(line if line.endswith("\n") else line + "\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(good)
+    return done
+
+def run_sweep(configs, out_path, games, policy, seed, max_time, workers, chunk):
+    done = load_done(out_path)
+    todo = [c for c in configs if config_key(c, policy, games, seed, max_time) not in done]
+    print(f"{len(configs)} configurations, {len(configs) - len(todo)} already done, {len(todo)} to run")
+    if not todo:
+        return
+
+    pending = {}  # config key -> [params, chunks left, scores, times]
+    start = time.perf_counter()
+    finished = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(out_path, "a", encoding="utf-8") as out:
+        futures = {}
+        for params in todo:
+            key = config_key(params, policy, games, seed, max_time)
+            # Every configuration plays the same seeds, so they are compared on identical traffic
+            chunks = [(seed + i, min(chunk, games - i)) for i in range(0, games, chunk)]
+            pending[key] = [params, len(chunks), [], []]
+            for first_seed, n in chunks:
+                futures[pool.submit(play_chunk, params, policy, first_seed, n, max_time)] = key
+        for future in as_completed(futures):
+            key = futures[future]
+            entry = pending[key]
+            scores, times = future.result()
+            entry[2].extend(scores)
+            entry[3].extend(times)
+            entry[1] -= 1
+            if entry[1]:
+                continue
+            params = entry[0]
+            record = {
+                "params": params,
+                "games": games,
+                "policy": policy,
+                "seed": seed,
+                "max_time": max_time,
+                "score": summarize(entry[2], SCORE_BIN),
+                "survival": summarize(entry[3], SURVIVAL_BIN),
+            }
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+            out.flush()
+            del pending[key]
+            finished += 1
+            elapsed = time.perf_counter() - start
+            print(f"[{finished}/{len(todo)}] {[params[name] for name in PARAM_NAMES]} survival p50 {record['survival']['p50']:.1f}s "
+                  f"score p50 {record['score']['p50']:.0f}  ({finished * games / elapsed:.0f} games/s)")
+
+def main():
+    default = DIFFICULTY_PARAMS[1]
+    parser = argparse.ArgumentParser(description="Sweep difficulty parameters with headless simulated games.")
+    parser.add_argument("--spawn-interval", default="0.6:1.4:5", help="start:stop:steps")
+    parser.add_argument("--speed-start", default="12:24:4", help="start:stop:steps")
+    parser.add_argument("--speed-inc", default=f"{default['obstacle_speed_inc']}", help="start:stop:steps")
+    parser.add_argument("--samples", type=int, default=0,
+                        help="draw this many random configurations from the ranges instead of a grid")
+    parser.add_argument("--games", type=int, default=200, help="games per configuration")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="dodge")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-time", type=float, default=300.0, help="seconds of game time per game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk", type=int, default=25, help="games per worker task")
+    parser.add_argument("--out", default="difficulty_sweep.jsonl")
+    args = parser.parse_args()
+
+    ranges = [parse_range(args.spawn_interval), parse_range(args.speed_start), parse_range(args.speed_inc)]
+    if args.samples:
+        configs = random_configs(ranges, args.samples, args.seed)
+    else:
+        configs = grid_configs(ranges)
+    run_sweep(configs, args.out, args.games, args.policy, args.seed, args.max_time, args.workers, args.chunk)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import ctypes
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bench import Renderer, use_headless_gl
+from replay import Replay, ReplayPlayer
+
+# Replay to video. Renders a recorded game offscreen at a fixed resolution and
+# frame rate through the game's own drawing code, into a framebuffer object.
+# Pixels come back through two pixel buffer objects used in turn, so reading
+# frame N overlaps drawing frame N+1. Frames are written as raw RGBA (top row
+# first) to a file, to stdout, or straight into ffmpeg.
+#
+#   python video.py replays/20250101_120000_Sam.cdr --ffmpeg highlight.mp4
+#   python video.py replays/x.cdr --out - | ffmpeg -f rawvideo -pix_fmt rgba -s 1280x720 -r 60 -i - x.mp4
+#   python video.py replays/x.cdr --out frames.rgba --size 640x360 --fps 30
+
+VIDEO_SIZE = (1280, 720)
+VIDEO_FPS = 60
+TAIL_SECONDS = 2.0   # keep filming the end screen for this long after the game ends
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+class FrameCapture:
+    # Framebuffer object of the video size plus two pixel pack buffers.
+    # capture() starts an asynchronous read of the frame just drawn and returns
+    # the previous frame's pixels (None on the first call); finish() returns the last one.
+    def __init__(self, game, width, height):
+        self.game = game
+        self.width, self.height = width, height
+        self.frame_bytes = width * height * 4
+        self.fbo = game.gen_framebuffer("video capture")
+        self.color_rb = game.gen_renderbuffer(self.frame_bytes, "video capture color")
+        self.depth_rb = game.gen_renderbuffer(self.frame_bytes, "video capture depth")
+        game.glBindRenderbuffer(game.GL_RENDERBUFFER, self.color_rb)
+        game.glRenderbufferStorage(game.GL_RENDERBUFFER, game.GL_RGBA8, width, height)
+        game.glBindRenderbuffer(game.GL_RENDERBUFFER, self.depth_rb)
+        game.glRenderbufferStorage(game.GL_RENDERBUFFER, game.GL_DEPTH_COMPONENT24, width, height)
+        game.glBindRenderbuffer(game.GL_RENDERBUFFER, 0)
+        game.glBindFramebuffer(game.GL_FRAMEBUFFER, self.fbo)
+        game.glFramebufferRenderbuffer(game.GL_FRAMEBUFFER, game.GL_COLOR_ATTACHMENT0,
+                                       game.GL_RENDERBUFFER, self.color_rb)
+        game.glFramebufferRenderbuffer(game.GL_FRAMEBUFFER, game.GL_DEPTH_ATTACHMENT,
+                                       game.GL_RENDERBUFFER, self.depth_rb)
+        status = game.glCheckFramebufferStatus(game.GL_FRAMEBUFFER)
+        if status != game.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer incomplete: 0x{int(status):x}")
+        game.glViewport(0, 0, width, height)
+
+        self.pbos = [game.gen_buffer(self.frame_bytes, "video capture pbo") for _ in range(2)]
+        for pbo in self.pbos:
+            game.glBindBuffer(game.GL_PIXEL_PACK_BUFFER, pbo)
+            game.glBufferData(game.GL_PIXEL_PACK_BUFFER, self.frame_bytes, None, game.GL_STREAM_READ)
+        game.glBindBuffer(game.GL_PIXEL_PACK_BUFFER, 0)
+        self.frames = 0
+
+    def capture(self):
+        game = self.game
+        game.glPixelStorei(game.GL_PACK_ALIGNMENT, 4)
+        game.glBindBuffer(game.GL_PIXEL_PACK_BUFFER, self.pbos[self.frames % 2])
+        game.glReadPixels(0, 0, self.width, self.height, game.GL_RGBA, game.GL_UNSIGNED_BYTE,
+                          ctypes.c_void_p(0))
+        pixels = self._read(self.pbos[(self.frames - 1) % 2]) if self.frames else None
+        game.glBindBuffer(game.GL_PIXEL_PACK_BUFFER, 0)
+        self.frames += 1
+        return pixels
+
+    def finish(self):
+        if not self.frames:
+            return None
+        pixels = self._read(self.pbos[(self.frames - 1) % 2])
+        self.game.glBindBuffer(self.game.GL_PIXEL_PACK_BUFFER, 0)
+        return pixels
+
+    def _read(self, pbo):
+        # Maps a pack buffer and copies its rows out top row first
+        game = self.game
+        game.glBindBuffer(game.GL_PIXEL_PACK_BUFFER, pbo)
+        address = game.glMapBuffer(game.GL_PIXEL_PACK_BUFFER, game.GL_READ_ONLY)
+        if not address:
+            raise RuntimeError("glMapBuffer failed")
+        mapped = (ctypes.c_ubyte * self.frame_bytes).from_address(address)
+        rows = np.frombuffer(mapped, dtype=np.uint8).reshape(self.height, self.width * 4)
+        pixels = rows[::-1].tobytes()
+        game.glUnmapBuffer(game.GL_PIXEL_PACK_BUFFER)
+        return pixels
+
+    def delete(self):
+        game = self.game
+        game.glBindFramebuffer(game.GL_FRAMEBUFFER, 0)
+        game.delete_buffers(self.pbos)
+        game.delete_renderbuffers([self.color_rb, self.depth_rb])
+        game.delete_framebuffer(self.fbo)
+
+def open_output(args, width, height, fps):
+    # Returns (file object, ffmpeg process or None)
+    if args.ffmpeg:
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            sys.exit("ffmpeg not found on PATH; use --out - and pipe into an encoder instead")
+        proc = subprocess.Popen([ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgba",
+                                 "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                                 "-pix_fmt", "yuv420p", args.ffmpeg], stdin=subprocess.PIPE)
+        return proc.stdin, proc
+    if args.out == "-":
+        # Frames own stdout; anything printed goes to stderr instead
+        out = sys.stdout.buffer
+        sys.stdout = sys.stderr
+        return out, None
+    return open(args.out, "wb"), None
+
+def render_replay(game, replay, out, width, height, fps, tail=TAIL_SECONDS):
+    # Draws the replay frame by frame at fps and writes the frames to out.
+    # Returns the number of frames written.
+    renderer = Renderer(game)
+    renderer.hud.hints = False  # key prompts mean nothing in a video
+    capture = FrameCapture(game, width, height)
+    player = ReplayPlayer(replay)
+    sim = player.sim
+    ticks_per_frame = 1.0 / (fps * sim.dt)
+    trailer = replay.trailer
+    end_frame = None
+    if trailer is not None:
+        end_frame = math.ceil(trailer["ticks"] / ticks_per_frame + tail * fps)
+    written = 0
+    frame = 0
+    try:
+        while end_frame is None or frame < end_frame:
+            # Frame k shows the game k / fps seconds in, between two ticks
+            position = frame * ticks_per_frame
+            target = int(position) + 1
+            while sim.ticks < target and not sim.game_over and not player.finished:
+                player.step()
+            if end_frame is None and (sim.game_over or player.finished):
+                end_frame = frame + math.ceil(tail * fps)
+            alpha = 1.0 if sim.ticks < target else position - int(position)
+            renderer.draw('replay', sim, alpha=alpha, replay=player)
+            pixels = capture.capture()
+            if pixels is not None:
+                out.write(pixels)
+                written += 1
+            frame += 1
+        pixels = capture.finish()
+        if pixels is not None:
+            out.write(pixels)
+            written += 1
+    finally:
+        capture.delete()
+        renderer.close()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a Car Dodge replay to raw video frames.")
+    parser.add_argument("replay")
+    parser.add_argument("--size", default=f"{VIDEO_SIZE[0]}x{VIDEO_SIZE[1]}", help="WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=VIDEO_FPS)
+    parser.add_argument("--tail", type=float, default=TAIL_SECONDS, help="seconds to keep filming after the end")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--out", help="raw RGBA frames to this file, or - for stdout")
+    output.add_argument("--ffmpeg", help="encode with ffmpeg into this file (e.g. out.mp4)")
+    parser.add_argument("--window", action="store_true", help="use the normal display instead of offscreen GL")
+    args = parser.parse_args()
+
+    if not args.window:
+        use_headless_gl()
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keep stdout clean for frames
+    import project as game  # after the environment is set up
+    width, height = parse_size(args.size)
+    # The HUD and the projection are laid out from WIN_W / WIN_H
+    game.WIN_W, game.WIN_H = width, height
+
+    replay = Replay(args.replay)
+    out, proc = open_output(args, width, height, args.fps)
+    start = time.perf_counter()
+    try:
+        frames = render_replay(game, replay, out, width, height, args.fps, args.tail)
+    finally:
+        if args.out == "-":
+            out.flush()
+        else:
+            out.close()
+        if proc is not None:
+            proc.wait()
+    elapsed = time.perf_counter() - start
+    seconds = frames / args.fps
+    print(f"{frames} frames ({seconds:.1f}s of video at {width}x{height}) in {elapsed:.1f}s "
+          f"= {frames / elapsed:.1f} fps, {seconds / elapsed:.2f}x real time", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()